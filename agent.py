@@ -8,12 +8,18 @@ from typing_extensions import TypedDict
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from langchain_groq import ChatGroq
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import create_react_agent
 
+from catalog import CATALOG_CHAT_LIMIT, get_catalog
+from db_profile import query_scope
+from customers import extract_name, extract_phone, find_customer, mask_address, mask_phone
+from intent_router import route_message
 from tools import (
     register_customer,
     create_order_draft,
@@ -31,14 +37,38 @@ logger = logging.getLogger(__name__)
 
 # ============ State Schema ============
 
+# 只保留最近的對話訊息，避免 checkpoint 隨對話長度無限增長
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "20"))
+
+
+def add_messages_window(left: list, right: list) -> list:
+    """add_messages, then keep only the last MAX_HISTORY_MESSAGES messages.
+
+    AI replies that carry a short `summary` in additional_kwargs (e.g. the
+    full product listing) are collapsed to that summary once they are no
+    longer the latest message, so the big text is stored only once.
+    """
+    merged = add_messages(left, right)
+    if len(merged) > MAX_HISTORY_MESSAGES:
+        merged = merged[-MAX_HISTORY_MESSAGES:]
+        # Keep the window starting at a user turn
+        while merged and not isinstance(merged[0], HumanMessage):
+            merged = merged[1:]
+    for i, m in enumerate(merged[:-1]):
+        summary = m.additional_kwargs.get("summary") if isinstance(m, AIMessage) else None
+        if summary and m.content != summary:
+            merged[i] = m.model_copy(update={"content": summary})
+    return merged
+
+
 class OrderState(TypedDict):
-    messages: Annotated[list, add_messages]
+    messages: Annotated[list, add_messages_window]
     workflow_phase: str  # idle / collect_info / confirm_info / collect_items / confirm_items / collect_delivery / preview_order
     customer_name: str | None
     customer_address: str | None
     customer_phone: str | None
     customer_id: int | None
-    items: list[dict] | None  # [{product_name, quantity}]
+    items: list[tuple[str, int]] | None  # [(product_name, quantity)]
     delivery_method: str | None
     payment_method: str | None
 
@@ -75,14 +105,34 @@ class DeliveryInfo(BaseModel):
 
 # ============ General agent (for non-ordering queries) ============
 
-GENERAL_PROMPT = "你是客戶服務助手，用繁體中文回覆。可以查產品、查庫存、查訂單、記損耗。"
-
-general_agent = create_react_agent(
-    llm,
-    [query_products, check_stock, query_orders, record_wastage],
-    prompt=GENERAL_PROMPT,
+GENERAL_PROMPT = (
+    "你是客戶服務助手，用繁體中文回覆。可以查產品、查庫存、查訂單、記損耗。"
+    "同時詢問多個產品時，請用 product_names 列表一次呼叫 check_stock 或 query_products。"
 )
 
+# 同一步驟中多個 tool call 會在 thread pool 上並行執行，這裡限制最大並行數
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+
+GENERAL_TOOLS = [query_products, check_stock, query_orders, record_wastage]
+
+
+def build_general_agent(model):
+    """ReAct agent for general queries.
+
+    checkpointer=False: it runs inside the "process" node with the full
+    history passed in, so it must not inherit the parent checkpointer and
+    leave a checkpoint namespace behind on every turn.
+    """
+    return create_react_agent(
+        model,
+        GENERAL_TOOLS,
+        prompt=GENERAL_PROMPT,
+        checkpointer=False,
+    )
+
+
+general_agent = build_general_agent(llm)
+
 # ============ Helpers ============
 
 def _is_confirm(msg: str) -> bool:
@@ -98,6 +148,61 @@ def _is_order_intent(msg: str) -> bool:
 
 
 
+def _is_profile_change(msg: str) -> bool:
+    """Check if a returning customer wants to update the stored profile."""
+    return any(kw in msg for kw in ["修改資料", "更新資料", "資料有誤", "改地址", "改電話", "換地址"])
+
+
+def _returning_customer(state: OrderState, msg: str) -> dict | None:
+    """Stored profile matching both the name and the phone number in the
+    message, else the profile already registered earlier in this session.
+    A name or a phone alone never loads a stored profile."""
+    phone, name = extract_phone(msg), extract_name(msg)
+    if phone and name:
+        return find_customer(phone=phone, name=name)
+    if state.get("customer_id") and state.get("customer_name"):
+        return {
+            "customer_id": state["customer_id"],
+            "customer_name": state["customer_name"],
+            "customer_address": state.get("customer_address"),
+            "customer_phone": state.get("customer_phone"),
+        }
+    return None
+
+
+def _product_list_reply(header: str) -> tuple[str, str]:
+    """Reply listing the products (cached per catalog version, capped for large catalogs) + its summary."""
+    products = get_catalog().render_text(limit=CATALOG_CHAT_LIMIT)
+    reply = (
+        f"{header}\n\n"
+        f"以下是我們的產品列表（也可到 http://localhost:8000/products 查看）：\n\n"
+        f"{products}\n\n"
+        f"請用產品名稱和數量來選購，例如「蘋果*2 牛奶*3」。"
+    )
+    summary = f"{header}已列出產品列表（http://localhost:8000/products），請用產品名稱和數量來選購。"
+    return reply, summary
+
+
+def _start_returning_order(profile: dict) -> dict:
+    """Skip collect_info / confirm_info: reuse the stored profile and go to collect_items.
+
+    Only called once the customer gave both name and phone; the reply
+    only shows the masked address / phone.
+    """
+    header = (
+        f"歡迎回來，{profile['customer_name']}！將使用您登記的資料：\n"
+        f"- 地址：{mask_address(profile['customer_address'])}\n"
+        f"- 電話：{mask_phone(profile['customer_phone'])}\n"
+        f"資料有變更請說「修改資料」。"
+    )
+    reply, summary = _product_list_reply(header)
+    return {
+        "messages": [AIMessage(content=reply, additional_kwargs={"summary": summary})],
+        "workflow_phase": "collect_items",
+        **{k: profile[k] for k in ("customer_id", "customer_name", "customer_address", "customer_phone")},
+    }
+
+
 def _clean_tool_result(result: str) -> str:
     """Remove embedded LLM instructions (after ---) from tool results."""
     if "---" in result:
@@ -105,6 +210,11 @@ def _clean_tool_result(result: str) -> str:
     return result
 
 
+def _items_as_dicts(items) -> list[dict]:
+    """Compact (product_name, quantity) pairs → the dicts the order tools expect."""
+    return [{"product_name": name, "quantity": qty} for name, qty in items or []]
+
+
 def _extract_int_field(text: str, keyword: str) -> int | None:
     """Extract an integer value after a keyword like '客戶ID: 3'."""
     for line in text.split("\n"):
@@ -119,17 +229,40 @@ def _extract_int_field(text: str, keyword: str) -> int | None:
 
 def handle_idle(state: OrderState, user_msg: str) -> dict:
     if _is_order_intent(user_msg):
+        # 老客戶（訊息帶電話/名稱，或本次對話已建過資料）直接選購
+        profile = _returning_customer(state, user_msg)
+        if profile:
+            return _start_returning_order(profile)
         return {
-            "messages": [AIMessage(content="您好，我們先建立您的基本資料。請提供您的 名稱、地址、電話。")],
+            "messages": [AIMessage(content="您好，我們先建立您的基本資料。請提供您的 名稱、地址、電話（老客戶只需提供名稱和電話）。")],
             "workflow_phase": "collect_info",
         }
+    # Common lookups (order number, price / stock, product list) are answered without the LLM
+    routed = route_message(user_msg)
+    if routed is not None:
+        extra = {"summary": routed.summary} if routed.summary else {}
+        return {"messages": [AIMessage(content=routed.reply, additional_kwargs=extra)]}
     # General query - delegate to ReAct agent
-    result = general_agent.invoke({"messages": state["messages"]})
+    result = general_agent.invoke(
+        {"messages": state["messages"]},
+        config={"max_concurrency": TOOL_CONCURRENCY},
+    )
     ai_msg = result["messages"][-1]
     return {"messages": [ai_msg]}
 
 
 def handle_collect_info(state: OrderState, user_msg: str) -> dict:
+    # 只給名稱和電話（沒有地址）且兩者都與已存在的客戶相符，不必再經 LLM 提取與確認；
+    # 只有名稱或只有電話不足以辨識身分，不查詢、也不帶出已存的資料
+    if not re.search(r"[市縣區鄉鎮路街巷號]", user_msg):
+        phone, name = extract_phone(user_msg), extract_name(user_msg, bare=True)
+        if not (phone and name):
+            return {"messages": [AIMessage(content="老客戶請提供登記的名稱和電話；新客戶請提供 名稱、地址、電話。")]}
+        profile = find_customer(phone=phone, name=name)
+        if profile:
+            return _start_returning_order(profile)
+        # 不說明是名稱還是電話不符，避免被用來試出客戶資料
+        return {"messages": [AIMessage(content="找不到相符的客戶資料。老客戶請確認登記的名稱和電話；新客戶請提供 名稱、地址、電話。")]}
     try:
         structured_llm = llm.with_structured_output(CustomerInfo)
         info = structured_llm.invoke(
@@ -165,18 +298,9 @@ def handle_confirm_info(state: OrderState, user_msg: str) -> dict:
             "customer_phone": state["customer_phone"],
         })
         customer_id = _extract_int_field(reg_result, "客戶ID")
-
-        # Get product list
-        products = query_products.invoke({"product_name": ""})
-
-        reply = (
-            f"客戶資料已建立！\n\n"
-            f"以下是我們的產品列表（也可到 http://localhost:8000/products 查看）：\n\n"
-            f"{products}\n\n"
-            f"請用產品名稱和數量來選購，例如「蘋果*2 牛奶*3」。"
-        )
+        reply, summary = _product_list_reply("客戶資料已建立！")
         return {
-            "messages": [AIMessage(content=reply)],
+            "messages": [AIMessage(content=reply, additional_kwargs={"summary": summary})],
             "workflow_phase": "collect_items",
             "customer_id": customer_id,
         }
@@ -188,12 +312,17 @@ def handle_confirm_info(state: OrderState, user_msg: str) -> dict:
 
 
 def handle_collect_items(state: OrderState, user_msg: str) -> dict:
+    if _is_profile_change(user_msg):
+        return {
+            "messages": [AIMessage(content="好的，請提供您的 名稱、地址、電話。")],
+            "workflow_phase": "collect_info",
+        }
     try:
         structured_llm = llm.with_structured_output(OrderItems)
         parsed = structured_llm.invoke(
             f"從以下訊息中提取訂單品項（產品名稱和數量）。訊息：{user_msg}"
         )
-        items = [{"product_name": i.product_name, "quantity": i.quantity} for i in parsed.items]
+        items = [(i.product_name, i.quantity) for i in parsed.items]
     except Exception as e:
         logger.error(f"Failed to parse order items via LLM: {e}", exc_info=True)
         return {
@@ -203,7 +332,7 @@ def handle_collect_items(state: OrderState, user_msg: str) -> dict:
     # Validate via create_order_draft
     draft_result = create_order_draft.invoke({
         "customer_name": state["customer_name"],
-        "items": items,
+        "items": _items_as_dicts(items),
     })
 
     if "找不到" in draft_result or "庫存不足" in draft_result:
@@ -231,11 +360,11 @@ def handle_confirm_items(state: OrderState, user_msg: str) -> dict:
     try:
         structured_llm = llm.with_structured_output(OrderItems)
         parsed = structured_llm.invoke(
-            f"用戶目前的訂單品項為：{json.dumps(state.get('items', []), ensure_ascii=False)}\n"
+            f"用戶目前的訂單品項為：{json.dumps(_items_as_dicts(state.get('items')), ensure_ascii=False)}\n"
             f"用戶說：{user_msg}\n"
             f"請根據用戶的修改意圖，產生完整的更新後品項列表。"
         )
-        merged = [{"product_name": i.product_name, "quantity": i.quantity} for i in parsed.items]
+        merged = [(i.product_name, i.quantity) for i in parsed.items]
     except Exception as e:
         logger.error(f"Failed to parse item modification via LLM: {e}", exc_info=True)
         return {
@@ -245,7 +374,7 @@ def handle_confirm_items(state: OrderState, user_msg: str) -> dict:
     # Validate merged items
     draft_result = create_order_draft.invoke({
         "customer_name": state["customer_name"],
-        "items": merged,
+        "items": _items_as_dicts(merged),
     })
 
     if "找不到" in draft_result or "庫存不足" in draft_result:
@@ -270,7 +399,7 @@ def handle_collect_delivery(state: OrderState, user_msg: str) -> dict:
 
         preview_result = preview_final_order.invoke({
             "customer_name": state["customer_name"],
-            "items": state["items"],
+            "items": _items_as_dicts(state["items"]),
             "delivery_method": info.delivery_method,
             "payment_method": info.payment_method,
         })
@@ -294,7 +423,7 @@ def handle_preview_order(state: OrderState, user_msg: str) -> dict:
     if _is_confirm(user_msg):
         result = confirm_order.invoke({
             "customer_name": state["customer_name"],
-            "items": state["items"],
+            "items": _items_as_dicts(state["items"]),
             "delivery_method": state["delivery_method"],
             "payment_method": state["payment_method"],
         })
@@ -340,7 +469,9 @@ def process_message(state: OrderState) -> dict:
         }
 
     handler = HANDLERS.get(phase, handle_idle)
-    return handler(state, user_msg)
+    # DB_PROFILE=1 時依 phase 統計每個 graph turn 的查詢數
+    with query_scope(f"turn:{phase}"):
+        return handler(state, user_msg)
 
 
 # ============ Build Graph ============
@@ -350,5 +481,51 @@ graph_builder.add_node("process", process_message)
 graph_builder.add_edge(START, "process")
 graph_builder.add_edge("process", END)
 
-checkpointer = MemorySaver()
+class LatestCheckpointSaver(MemorySaver):
+    """MemorySaver that keeps only the newest checkpoint per thread.
+
+    LangGraph already writes a new blob only for channels whose version
+    changed; this also drops the superseded checkpoints, blobs and pending
+    writes, so memory per session tracks the current state instead of the
+    whole history. get_state_history() therefore only returns the latest
+    checkpoint.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._latest: dict[tuple[str, str], tuple[str, dict]] = {}
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        key = (thread_id, checkpoint_ns)
+
+        previous = self._latest.get(key)
+        self._latest[key] = (checkpoint["id"], dict(checkpoint["channel_versions"]))
+        if previous is None:
+            return next_config
+
+        prev_id, prev_versions = previous
+        if prev_id != checkpoint["id"]:
+            self.storage[thread_id][checkpoint_ns].pop(prev_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, prev_id), None)
+        for channel, version in prev_versions.items():
+            if checkpoint["channel_versions"].get(channel) != version:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [k for k in self._latest if k[0] == thread_id]:
+            del self._latest[key]
+
+
+checkpointer = LatestCheckpointSaver()
 agent_executor = graph_builder.compile(checkpointer=checkpointer)
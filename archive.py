@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+import argparse
+import sqlite3
+
+import database
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# 已送達且超過 ARCHIVE_AFTER_DAYS 天的訂單搬到封存資料庫；查詢預設只看主資料庫（熱資料）
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH", "")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "2000"))
+
+ARCHIVED_TABLES = {"orders", "customer_order_detail"}
+
+ARCHIVE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS archive.orders (
+        order_id        INTEGER PRIMARY KEY,
+        customer_name   TEXT NOT NULL,
+        delivery_method TEXT NOT NULL,
+        payment_method  TEXT NOT NULL,
+        total_price     REAL NOT NULL DEFAULT 0,
+        is_delivered    INTEGER NOT NULL DEFAULT 0,
+        created_at      TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS archive.customer_order_detail (
+        id           INTEGER PRIMARY KEY,
+        customer_id  INTEGER NOT NULL,
+        product_id   INTEGER NOT NULL,
+        order_id     INTEGER NOT NULL,
+        quantity     INTEGER NOT NULL,
+        unit_price   REAL NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_detail_order ON customer_order_detail(order_id)",
+]
+
+ORDER_COLUMNS = "order_id, customer_name, delivery_method, payment_method, total_price, is_delivered, created_at"
+DETAIL_COLUMNS = "id, customer_id, product_id, order_id, quantity, unit_price"
+
+
+def archive_path() -> str:
+    """ARCHIVE_DB_PATH, or <DB_PATH without .db>_archive.db next to the main database."""
+    return ARCHIVE_DB_PATH or f"{os.path.splitext(database.DB_PATH)[0]}_archive.db"
+
+
+def attach_archive(conn: sqlite3.Connection, uri: bool = False) -> bool:
+    """Attach the archive as schema `archive` for reading; False if none exists yet.
+
+    Without an archive file an empty in-memory `archive` is attached, so
+    reads see "no archived orders". uri=True attaches read-only.
+    """
+    path = archive_path()
+    if os.path.exists(path):
+        conn.execute("ATTACH DATABASE ? AS archive", (f"file:{path}?mode=ro" if uri else path,))
+        return True
+    conn.execute("ATTACH DATABASE ':memory:' AS archive")
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    return False
+
+
+def get_archive_connection() -> sqlite3.Connection:
+    """Main-database connection with the archive attached (read paths)."""
+    conn = get_connection()
+    attach_archive(conn)
+    return conn
+
+
+def archive_delivered_orders(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    pause: float = 0.0,
+) -> dict:
+    """Move delivered orders older than `older_than_days` (and their detail
+    lines) into the archive database, `batch_size` orders at a time.
+
+    Each batch is two short transactions: copy into the archive, then delete
+    from the main database only what the archive now holds. SQLite does not
+    commit attached WAL databases atomically together, so this order means a
+    crash can leave an order in both databases (fixed by the next run,
+    which re-copies with INSERT OR REPLACE) but never in neither. The main
+    database is write-locked only for the delete, so chat writes keep
+    flowing between batches; `pause` adds a gap between batches.
+    """
+    conn = get_connection()
+    conn.isolation_level = None
+    conn.execute("PRAGMA busy_timeout = 5000")
+    # 封存資料庫與其 schema 只在這裡建立；讀取端只 ATTACH
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(),))
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (order_id INTEGER PRIMARY KEY)")
+    cutoff = f"-{int(older_than_days)} days"
+    stats = {"orders": 0, "details": 0, "batches": 0, "max_lock_ms": 0.0}
+    last_id = 0
+    try:
+        while True:
+            ids = conn.execute(
+                """SELECT order_id FROM main.orders
+                   WHERE order_id > ? AND is_delivered = 1
+                     AND (created_at IS NULL OR created_at < datetime('now', ?))
+                   ORDER BY order_id LIMIT ?""",
+                (last_id, cutoff, batch_size),
+            ).fetchall()
+            if not ids:
+                break
+            last_id = ids[-1][0]
+            # 只寫封存資料庫（和 temp），主資料庫在這段期間只被讀取
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM temp.archive_batch")
+            conn.executemany("INSERT INTO temp.archive_batch VALUES (?)", ids)
+            conn.execute(f"""INSERT OR REPLACE INTO archive.orders ({ORDER_COLUMNS})
+                             SELECT {ORDER_COLUMNS} FROM main.orders
+                             WHERE order_id IN (SELECT order_id FROM temp.archive_batch)""")
+            details = conn.execute(f"""INSERT OR REPLACE INTO archive.customer_order_detail ({DETAIL_COLUMNS})
+                                       SELECT {DETAIL_COLUMNS} FROM main.customer_order_detail
+                                       WHERE order_id IN (SELECT order_id FROM temp.archive_batch)""").rowcount
+            conn.execute("COMMIT")
+
+            start = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""DELETE FROM main.customer_order_detail
+                            WHERE order_id IN (SELECT order_id FROM archive.orders
+                                               WHERE order_id IN (SELECT order_id FROM temp.archive_batch))""")
+            moved = conn.execute("""DELETE FROM main.orders
+                                    WHERE order_id IN (SELECT order_id FROM archive.orders
+                                                       WHERE order_id IN (SELECT order_id FROM temp.archive_batch))""").rowcount
+            conn.execute("COMMIT")
+
+            stats["max_lock_ms"] = max(stats["max_lock_ms"], (time.perf_counter() - start) * 1000)
+            stats["orders"] += moved
+            stats["details"] += details
+            stats["batches"] += 1
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    logger.info(f"Archived {stats['orders']} orders / {stats['details']} detail lines in {stats['batches']} batches")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move delivered orders into the archive database")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive orders older than this")
+    parser.add_argument("--batch", type=int, default=ARCHIVE_BATCH_SIZE, help="orders per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = archive_delivered_orders(args.days, args.batch, args.pause)
+    print(f"已封存 {result['orders']} 筆訂單、{result['details']} 筆明細（{archive_path()}）")
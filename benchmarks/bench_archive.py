@@ -0,0 +1,142 @@
+"""Hot/cold order archival: hot-path query time before and after moving
+delivered orders into the archive database.
+
+Builds a throw-away database with --orders orders (2 detail lines each),
+--delivered of them old and delivered, times the order query paths, runs
+archive.archive_delivered_orders() and times them again.
+
+    python -m benchmarks.bench_archive --orders 1000000
+    python -m benchmarks.bench_archive --orders 10000000 --repeat 3
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+import database  # noqa: E402
+
+
+def populate(orders: int, delivered: float) -> None:
+    """Bulk-insert orders + detail lines with SQL generate loops; the detail
+    index is dropped during the load and rebuilt afterwards."""
+    old = int(orders * delivered)
+    conn = database.get_connection()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("DROP INDEX IF EXISTS idx_detail_order")
+    conn.execute(
+        """WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < ?)
+           INSERT INTO orders (order_id, customer_name, delivery_method, payment_method, total_price, is_delivered, created_at)
+           SELECT i, '客戶' || printf('%05d', i % 50000), '專車', '現金', 1045,
+                  i <= ?, CASE WHEN i <= ? THEN '2024-01-01 00:00:00' ELSE CURRENT_TIMESTAMP END
+           FROM s""",
+        (orders, old, old),
+    )
+    conn.execute(
+        """INSERT INTO customer_order_detail (customer_id, product_id, order_id, quantity, unit_price)
+           SELECT 1 + order_id % 3, 1 + order_id % 5, order_id, 1, 500 FROM orders
+           UNION ALL
+           SELECT 1 + order_id % 3, 1 + (order_id + 2) % 5, order_id, 3, 45 FROM orders"""
+    )
+    conn.commit()
+    conn.execute("CREATE INDEX idx_detail_order ON customer_order_detail(order_id)")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def hot_paths(orders: int) -> dict:
+    import main
+    import replica
+    from tools import query_orders
+
+    # 量的是主資料庫本身，管理端點不走快照副本
+    replica.ADMIN_READ_REPLICA = False
+
+    recent = orders - 1
+    customer = f"客戶{recent % 50000:05d}"
+    return {
+        "query_orders(order_id)": lambda: query_orders.invoke({"order_id": recent}),
+        "query_orders(customer_name)": lambda: query_orders.invoke({"customer_name": customer}),
+        "GET /api/admin/order/{id}": lambda: main.get_order_detail(recent),
+        "COUNT undelivered": count_undelivered,
+    }
+
+
+def count_undelivered() -> int:
+    conn = database.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM orders WHERE is_delivered = 0").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def db_size(path: str) -> float:
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p)) / 1e6
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--delivered", type=float, default=0.95, help="fraction that is old and delivered")
+    parser.add_argument("--batch", type=int, default=2000, help="orders per archive batch")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-archive-") as tmp:
+        database.DB_PATH = os.path.join(tmp, "product.db")
+        database.init_db()
+        database.seed_sample_data()
+
+        start = time.perf_counter()
+        populate(args.orders, args.delivered)
+        print(f"loaded {args.orders:,} orders / {args.orders * 2:,} detail lines in {time.perf_counter() - start:.1f}s "
+              f"({db_size(database.DB_PATH):.0f}MB)")
+
+        import archive
+        paths = hot_paths(args.orders)
+        before = {name: timed(fn, args.repeat) for name, fn in paths.items()}
+
+        start = time.perf_counter()
+        stats = archive.archive_delivered_orders(batch_size=args.batch)
+        elapsed = time.perf_counter() - start
+        print(f"archived {stats['orders']:,} orders / {stats['details']:,} details in {elapsed:.1f}s "
+              f"({stats['orders'] / elapsed:,.0f} orders/s, {stats['batches']} batches, "
+              f"longest main-DB write lock {stats['max_lock_ms']:.1f}ms)")
+
+        # 封存後 VACUUM 前後都量：DELETE 只釋放 page，檔案大小要 VACUUM 才會變小
+        after = {name: timed(fn, args.repeat) for name, fn in paths.items()}
+        conn = database.get_connection()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        vacuumed = {name: timed(fn, args.repeat) for name, fn in paths.items()}
+        print(f"hot DB {db_size(database.DB_PATH):.0f}MB after VACUUM, archive DB {db_size(archive.archive_path()):.0f}MB")
+
+        from tools import query_orders
+        cold = timed(lambda: query_orders.invoke({"order_id": 1, "include_archived": True}), args.repeat)
+
+    print(f"{'hot path (median ms)':<30}{'before':>12}{'archived':>12}{'+VACUUM':>12}")
+    for name in paths:
+        print(f"{name:<30}{before[name]:>12.2f}{after[name]:>12.2f}{vacuumed[name]:>12.2f}")
+    print(f"{'archived order (opt-in)':<30}{'':>12}{cold:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Product listing cost: per-request rendering vs the versioned catalog cache.
+
+    python -m benchmarks.bench_catalog --sizes 10,100,1000,10000,100000
+"""
+
+import sys
+import time
+import argparse
+
+from benchmarks.harness import offline_env
+
+
+def per_request_listing(get_connection) -> str:
+    """What query_products(product_name="") did on every call before the cache."""
+    conn = get_connection()
+    rows = conn.execute("SELECT * FROM product").fetchall()
+    conn.close()
+    return "\n".join(
+        f"產品ID: {r['product_id']}, 名稱: {r['product_name']}, "
+        f"價格: {r['price']}元/{r['unit']}, 庫存: {r['stock']}{r['unit']}, "
+        f"供應商: {r['supplier']}, 規格: {r['specification']}"
+        for r in rows
+    )
+
+
+def timeit(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'products':>9} {'per-request':>12} {'cold build':>11} {'cached':>9} "
+          f"{'chat chars':>11} {'json KB':>9} {'gzip KB':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with offline_env(extra_products=max(size - 5, 0)) as env:
+            catalog = env.modules["catalog"]
+            get_connection = env.modules["tools"].get_connection
+            repeat = max(1, min(args.repeat, 2_000_000 // max(size, 1)))
+
+            baseline_ms = timeit(lambda: per_request_listing(get_connection), repeat)
+
+            def cold():
+                catalog._current = None
+                c = catalog.get_catalog()
+                return c.text, c.gzip_body
+
+            cold_ms = timeit(cold, repeat)
+            warm_ms = timeit(lambda: catalog.get_catalog().text, args.repeat * 10)
+
+            c = catalog.get_catalog()
+            chat_chars = len(c.render_text(limit=catalog.CATALOG_CHAT_LIMIT))
+            print(f"{size:>9} {baseline_ms:>10.2f}ms {cold_ms:>9.2f}ms {warm_ms:>7.3f}ms "
+                  f"{chat_chars:>11} {len(c.json_body) / 1024:>9.1f} {len(c.gzip_body) / 1024:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Offline replay / load test for the chat workflow.
+
+Drives the scripted scenarios in benchmarks.harness through agent_executor
+directly ("graph") and through the FastAPI app ("api") with a fake LLM, then
+reports throughput, latency percentiles, DB queries and LLM calls per turn.
+
+    python -m benchmarks.bench_chat --sessions 40 --concurrency 8 --latency 0.05
+    python -m benchmarks.bench_chat --json out.json
+    python -m benchmarks.bench_chat --baseline out.json   # exit 1 on regression
+"""
+
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.harness import ERROR_REPLY, SCENARIOS, check_replies, offline_env, summarize, format_summary
+
+
+def _session_plan(sessions: int, scenarios: list[str]) -> list[tuple[str, list[str]]]:
+    return [(name, SCENARIOS[name]) for name in (scenarios[i % len(scenarios)] for i in range(sessions))]
+
+
+def run_graph_session(executor, scenario: str, turns: list[str]) -> tuple[list[float], list[str]]:
+    config = {"configurable": {"thread_id": f"bench-{uuid.uuid4().hex}"}}
+    latencies, replies = [], []
+    for message in turns:
+        start = time.perf_counter()
+        try:
+            result = executor.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+            replies.append(result["messages"][-1].content)
+        except Exception as e:
+            # 與 main.chat 相同：例外變成錯誤回覆，由 check_replies 計為失敗
+            replies.append(f"{ERROR_REPLY}（{type(e).__name__}: {e}）")
+        latencies.append(time.perf_counter() - start)
+    return latencies, check_replies(scenario, replies)
+
+
+def bench_graph(env, plan: list[tuple[str, list[str]]], concurrency: int) -> dict:
+    executor = env.modules["agent"].agent_executor
+    env.queries.reset()
+    env.llm.reset_calls()
+    latencies, failures = [], []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for lats, problems in pool.map(lambda session: run_graph_session(executor, *session), plan):
+            latencies.extend(lats)
+            failures.extend(problems)
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, len(latencies), env.queries.count, env.llm.calls, failures)
+
+
+async def _api_session(client, scenario: str, turns: list[str], semaphore: asyncio.Semaphore) -> tuple[list[float], list[str]]:
+    session_id = f"bench-{uuid.uuid4().hex}"
+    latencies, replies = [], []
+    async with semaphore:
+        for message in turns:
+            start = time.perf_counter()
+            res = await client.post("/api/chat", json={"message": message, "session_id": session_id})
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            replies.append(res.json()["reply"])
+    return latencies, check_replies(scenario, replies)
+
+
+def bench_api(env, plan: list[tuple[str, list[str]]], concurrency: int) -> dict:
+    import httpx
+
+    app = env.modules["main"].app
+
+    async def _run():
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await asyncio.gather(*(_api_session(client, name, t, semaphore) for name, t in plan))
+
+    env.queries.reset()
+    env.llm.reset_calls()
+    start = time.perf_counter()
+    results = asyncio.run(_run())
+    elapsed = time.perf_counter() - start
+    latencies = [lat for lats, _ in results for lat in lats]
+    failures = [p for _, problems in results for p in problems]
+    return summarize(latencies, elapsed, len(latencies), env.queries.count, env.llm.calls, failures)
+
+
+def bench_allocations(env, plan: list[list[str]]) -> float:
+    """Mean peak traced allocation (KB) per turn, measured sequentially."""
+    executor = env.modules["agent"].agent_executor
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _, turns in plan:
+            config = {"configurable": {"thread_id": f"alloc-{uuid.uuid4().hex}"}}
+            for message in turns:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+                executor.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+    return round(sum(peaks) / len(peaks) / 1024, 1) if peaks else 0.0
+
+
+def check_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Any functional failure is a regression; counters may only drift by
+    ordering noise (2%); timings get `tolerance` headroom."""
+    problems = []
+    for name, current in results.items():
+        problems += [f"{name}: {failure}" for failure in current.get("failures", [])]
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("queries_per_turn", "llm_calls_per_turn"):
+            if current[key] > base[key] * 1.02 + 1e-9:
+                problems.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if current["latency_ms"]["p50"] > base["latency_ms"]["p50"] * (1 + tolerance):
+            problems.append(f"{name}: p50 {base['latency_ms']['p50']}ms -> {current['latency_ms']['p50']}ms")
+        if current["throughput_tps"] < base["throughput_tps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {base['throughput_tps']} -> {current['throughput_tps']} turn/s")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["graph", "api", "both"], default="both")
+    parser.add_argument("--scenarios", default="order,lookup,modify",
+                        help=f"comma separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--sessions", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake LLM latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alloc", action="store_true", help="also measure allocations per turn")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json result")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    plan = _session_plan(args.sessions, scenarios)
+    results = {}
+
+    with offline_env(latency=args.latency, jitter=args.jitter, seed=args.seed) as env:
+        if args.mode in ("graph", "both"):
+            results[f"graph c={args.concurrency}"] = bench_graph(env, plan, args.concurrency)
+        if args.mode in ("api", "both"):
+            results[f"api c={args.concurrency}"] = bench_api(env, plan, args.concurrency)
+        if args.alloc:
+            kb = bench_allocations(env, plan[: max(1, len(scenarios))])
+            for summary in results.values():
+                summary["alloc_kb_per_turn"] = kb
+
+    for name, summary in results.items():
+        print(format_summary(name, summary))
+        for failure in summary["failures"][:5]:
+            print(f"  FAILED {failure}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = check_regressions(results, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        return 1 if problems else 0
+    return 1 if any(summary["failures"] for summary in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
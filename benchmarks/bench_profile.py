@@ -0,0 +1,161 @@
+"""DB instrumentation and sampling profiler: cost when off and when on.
+
+1. Disabled path: times each hook the instrumentation adds to a request
+   (the profiled() endpoint wrapper, query_scope() per graph turn,
+   connection_factory() per get_connection, current_scope() per write)
+   and scales it by the queries per turn measured in part 2.
+2. End to end: replays the order / lookup / modify scenarios through
+   /api/chat (in-process ASGI, one session at a time) with instrumentation
+   off, with DB_PROFILE=1, and with DB_PROFILE=1 plus every request
+   profiled. Modes are interleaved over --rounds to cancel drift.
+3. Per statement: a point query on a plain connection vs ProfiledConnection.
+
+    python -m benchmarks.bench_profile --sessions 30 --rounds 5
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.harness import SCENARIOS, offline_env, percentile
+
+MODES = {
+    "off": (False, 0.0),
+    "DB_PROFILE=1": (True, 0.0),
+    "DB_PROFILE=1 + profile 100%": (True, 1.0),
+}
+
+
+def per_call_ns(fn, n: int = 200_000) -> float:
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        samples.append((time.perf_counter_ns() - start) / n)
+    return min(samples)
+
+
+def disabled_hooks(db_profile) -> dict:
+    db_profile.DB_PROFILE, db_profile.PROFILE_SAMPLE_RATE = False, 0.0
+
+    def noop():
+        return None
+
+    wrapped = db_profile.profiled("bench")(noop)
+
+    def scoped():
+        with db_profile.query_scope("turn:bench"):
+            return None
+
+    empty = per_call_ns(noop)
+    hooks = {
+        "profiled() wrapper": wrapped,
+        "query_scope()": scoped,
+        "connection_factory()": db_profile.connection_factory,
+        "current_scope()": db_profile.current_scope,
+    }
+    return {name: max(0.0, per_call_ns(fn) - empty) for name, fn in hooks.items()}
+
+
+async def _replay(client, sessions: int) -> list[float]:
+    latencies = []
+    names = list(SCENARIOS)
+    for i in range(sessions):
+        session_id = f"profile-{uuid.uuid4().hex}"
+        for message in SCENARIOS[names[i % len(names)]]:
+            start = time.perf_counter()
+            res = await client.post("/api/chat", json={"message": message, "session_id": session_id})
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def end_to_end(env, sessions: int, rounds: int) -> dict:
+    import httpx
+
+    db_profile = env.modules["db_profile"]
+    results = {name: {"latencies": [], "queries": 0} for name in MODES}
+
+    async def _run():
+        transport = httpx.ASGITransport(app=env.modules["main"].app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await _replay(client, len(SCENARIOS))  # 暖機
+            for _ in range(rounds):
+                for name, (enabled, rate) in MODES.items():
+                    db_profile.DB_PROFILE, db_profile.PROFILE_SAMPLE_RATE = enabled, rate
+                    env.queries.reset()
+                    results[name]["latencies"] += await _replay(client, sessions)
+                    results[name]["queries"] += env.queries.count
+
+    try:
+        asyncio.run(_run())
+    finally:
+        db_profile.DB_PROFILE, db_profile.PROFILE_SAMPLE_RATE = False, 0.0
+    return results
+
+
+def per_statement(db_path: str, db_profile, n: int = 20_000) -> dict:
+    out = {}
+    for name, factory in (("plain", sqlite3.Connection), ("profiled", db_profile.ProfiledConnection)):
+        conn = sqlite3.connect(db_path, factory=factory)
+        conn.row_factory = sqlite3.Row
+        start = time.perf_counter()
+        for i in range(n):
+            conn.execute("SELECT price FROM product WHERE product_id = ?", (i % 5 + 1,)).fetchone()
+        out[name] = (time.perf_counter() - start) / n * 1e6
+        conn.close()
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=30, help="sessions per mode per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    import db_profile
+
+    with tempfile.TemporaryDirectory(prefix="bench-profile-") as profile_dir, offline_env() as env:
+        db_profile.PROFILE_DIR = profile_dir
+        env.modules["db_profile"] = db_profile
+        hooks = disabled_hooks(db_profile)
+        results = end_to_end(env, args.sessions, args.rounds)
+        statement = per_statement(env.db_path, db_profile)
+        profiles = os.listdir(profile_dir)
+        slow = db_profile.stats()["slow"]
+
+    off = results["off"]
+    turns = len(off["latencies"])
+    queries_per_turn = off["queries"] / turns
+    turn_ns = (hooks["profiled() wrapper"] + hooks["query_scope()"]
+               + queries_per_turn * (hooks["connection_factory()"] + hooks["current_scope()"]))
+    mean_turn = statistics.fmean(off["latencies"])
+
+    print("disabled path, per call:")
+    for name, ns in hooks.items():
+        print(f"  {name:<24}{ns:>8.0f} ns")
+    print(f"  per turn (<= 1 wrapper + 1 scope + {queries_per_turn:.1f} connections/writes): {turn_ns / 1000:.2f} us "
+          f"= {turn_ns / (mean_turn * 1e9) * 100:.4f}% of a {mean_turn * 1000:.2f} ms turn")
+    print()
+    print(f"{'/api/chat turns':<30}{'p50 ms':>10}{'p90 ms':>10}{'mean ms':>10}{'vs off':>9}{'q/turn':>8}")
+    for name, r in results.items():
+        lat = r["latencies"]
+        mean = statistics.fmean(lat)
+        print(f"{name:<30}{percentile(lat, 50) * 1000:>10.3f}{percentile(lat, 90) * 1000:>10.3f}"
+              f"{mean * 1000:>10.3f}{(mean / mean_turn - 1) * 100:>8.1f}%{r['queries'] / len(lat):>8.2f}")
+    print(f"  {len(profiles)} collapsed-stack profiles written, {slow} slow queries logged")
+    print()
+    print(f"point query: plain {statement['plain']:.2f} us, profiled {statement['profiled']:.2f} us "
+          f"(+{statement['profiled'] - statement['plain']:.2f} us)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Admin read replica: order-confirmation latency while the admin page
+exports large tables.
+
+Loads --orders extra orders, then places orders through /api/chat (the
+returning-customer flow) while --exporters clients keep downloading
+/api/admin/table/orders and /api/admin/table/customer_order_detail.
+The app runs on a real uvicorn server in a background thread. Reports the
+client-side latency of the final "確認" turn, which writes the order,
+with no export, with the export reading the live database, and with the
+export reading the snapshot replica.
+
+    python -m benchmarks.bench_replica --orders 200000 --confirmations 30
+"""
+
+import sys
+import time
+import uuid
+import socket
+import argparse
+import threading
+import statistics
+
+import httpx
+import uvicorn
+
+from benchmarks.harness import offline_env, percentile
+from benchmarks.bench_archive import populate
+
+ORDER_TURNS = ["我要下單，我是王大明，電話 0912345678", "蘋果*1", "確認", "專車 現金"]
+EXPORT_TABLES = ["orders", "customer_order_detail"]
+
+
+def _place_orders(base_url: str, count: int) -> list[float]:
+    latencies = []
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        for _ in range(count):
+            session_id = f"replica-{uuid.uuid4().hex}"
+            for message in ORDER_TURNS:
+                client.post("/api/chat", json={"message": message, "session_id": session_id}).raise_for_status()
+            start = time.perf_counter()
+            res = client.post("/api/chat", json={"message": "確認", "session_id": session_id})
+            latencies.append(time.perf_counter() - start)
+            assert "訂單建立成功" in res.json()["reply"], res.json()["reply"]
+    return latencies
+
+
+def _export(base_url: str, stop: threading.Event, stats: dict, offset: int) -> None:
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        i = offset
+        while not stop.is_set():
+            res = client.get(f"/api/admin/table/{EXPORT_TABLES[i % len(EXPORT_TABLES)]}")
+            res.raise_for_status()
+            stats["exports"] += 1
+            stats["versions"].add(res.headers.get("x-data-version"))
+            i += 1
+
+
+def run(base_url: str, confirmations: int, exporters: int) -> tuple[list[float], dict]:
+    stats = {"exports": 0, "versions": set()}
+    stop = threading.Event()
+    threads = [threading.Thread(target=_export, args=(base_url, stop, stats, i)) for i in range(exporters)]
+    for t in threads:
+        t.start()
+    # 等匯出開始後再量
+    time.sleep(0.5 if exporters else 0)
+    latencies = _place_orders(base_url, confirmations)
+    stop.set()
+    for t in threads:
+        t.join()
+    return latencies, stats
+
+
+def serve(app) -> tuple[uvicorn.Server, str]:
+    """Run the app on a real HTTP server in a background thread, so a
+    blocked event loop shows up in client-side latency."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000, help="extra orders to make the export heavy")
+    parser.add_argument("--confirmations", type=int, default=30)
+    parser.add_argument("--exporters", type=int, default=2)
+    parser.add_argument("--staleness", type=float, default=5.0, help="REPLICA_MAX_STALENESS (s)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with offline_env() as env:
+        populate(args.orders, delivered=0.0)
+        main_module, replica = env.modules["main"], env.modules["replica"]
+        replica.REPLICA_MAX_STALENESS = args.staleness
+        use_replica_default = replica.ADMIN_READ_REPLICA
+        server, base_url = serve(main_module.app)
+        try:
+            for name, exporters, use_replica in (("no export", 0, False),
+                                                 ("export from live DB", args.exporters, False),
+                                                 ("export from replica", args.exporters, True)):
+                replica.ADMIN_READ_REPLICA = use_replica
+                if use_replica:
+                    replica.get_replica().snapshot()  # 第一次快照不計入
+                results[name] = run(base_url, args.confirmations, exporters)
+            copies = replica.get_replica()
+            copy_stats = (copies.refreshes, copies.restarts, copies.single_step)
+        finally:
+            server.should_exit = True
+            replica.ADMIN_READ_REPLICA = use_replica_default
+
+    for name, (latencies, stats) in results.items():
+        versions = sorted((v for v in stats["versions"] if v), key=lambda v: (len(v), v))
+        print(
+            f"{name:<22} confirm p50={percentile(latencies, 50) * 1000:8.1f}ms "
+            f"p90={percentile(latencies, 90) * 1000:8.1f}ms p99={percentile(latencies, 99) * 1000:8.1f}ms "
+            f"mean={statistics.fmean(latencies) * 1000:8.1f}ms  exports={stats['exports']}"
+            + (f"  data versions seen={','.join(versions)}" if versions else "")
+        )
+    print("replica copies={} (restarted by commits {} times, {} redone in one step)".format(*copy_stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Returning-customer fast path: turns, LLM calls and time per order.
+
+Compares the full first-time flow (collect_info → confirm_info → items …)
+with a returning customer identified by name + phone in the first
+message, by name + phone at the info prompt, and by the profile already
+in the session.
+
+    python -m benchmarks.bench_returning --orders 20 --latency 0.3
+"""
+
+import sys
+import time
+import uuid
+import argparse
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.harness import offline_env
+
+ITEMS_AND_DELIVERY = ["蘋果*2 牛奶*3", "確認", "專車 貨到付款", "確認"]
+
+FLOWS = {
+    # 每筆訂單的對話；session 流程的第一筆訂單先建立資料（不計入）
+    "first-time (collect/confirm info)": ["我要下單", "{name}，台北市信義區信義路五段7號，{phone}", "確認", *ITEMS_AND_DELIVERY],
+    "returning: name + phone in first message": ["我要下單，我是王大明，電話 0912345678", *ITEMS_AND_DELIVERY],
+    "returning: name + phone at info prompt": ["我要下單", "王大明 0912-345-678", *ITEMS_AND_DELIVERY],
+    "returning: same session": ["我要下單", *ITEMS_AND_DELIVERY],
+}
+
+
+def run_flow(env, name: str, turns: list[str], orders: int) -> dict:
+    executor = env.modules["agent"].agent_executor
+    config = {"configurable": {"thread_id": f"returning-{uuid.uuid4().hex}"}}
+    if name == "returning: same session":
+        for message in FLOWS["first-time (collect/confirm info)"]:
+            message = message.format(name="趙老客", phone="0955000000")
+            executor.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+
+    env.llm.reset_calls()
+    env.queries.reset()
+    count = 0
+    start = time.perf_counter()
+    for i in range(orders):
+        if name != "returning: same session":
+            config = {"configurable": {"thread_id": f"returning-{uuid.uuid4().hex}"}}
+        for message in turns:
+            message = message.format(name=f"新客戶{i:05d}", phone=f"09{i:08d}")
+            executor.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+            count += 1
+        result = executor.get_state(config).values
+        assert result["workflow_phase"] == "idle", f"{name}: order {i} ended in {result['workflow_phase']}"
+    elapsed = time.perf_counter() - start
+    return {
+        "turns": count / orders,
+        "llm": env.llm.calls / orders,
+        "queries": env.queries.count / orders,
+        "ms": elapsed / orders * 1000,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM latency per call (s)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with offline_env(latency=args.latency) as env:
+        for name, turns in FLOWS.items():
+            results[name] = run_flow(env, name, turns, args.orders)
+
+    base = results["first-time (collect/confirm info)"]
+    for name, r in results.items():
+        print(
+            f"{name:<41} turns/order={r['turns']:<4.1f} llm/order={r['llm']:<4.1f} "
+            f"queries/order={r['queries']:<6.1f} time/order={r['ms']:8.1f}ms  "
+            f"saved: {base['turns'] - r['turns']:.0f} turns, {base['llm'] - r['llm']:.0f} LLM calls"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
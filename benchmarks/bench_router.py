@@ -0,0 +1,99 @@
+"""Intent router: share of idle-phase traffic answered without the LLM and
+the latency saved.
+
+Replays a mix of customer-service messages through agent_executor with the
+router enabled and disabled (every message goes to the ReAct agent), using
+the fake LLM with a fixed per-call latency.
+
+    python -m benchmarks.bench_router --repeat 20 --latency 0.3
+"""
+
+import sys
+import time
+import uuid
+import argparse
+import statistics
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.harness import offline_env, percentile
+
+# 大致依客服訊息比例排列：查價 / 查庫存 / 查訂單 / 產品列表 / 其他
+TRAFFIC = [
+    "蘋果多少錢",
+    "請問牛奶的價格？",
+    "香蕉單價",
+    "平果多少錢",
+    "蘋果、香蕉、牛奶還有多少庫存",
+    "雞蛋還有貨嗎",
+    "白米庫存",
+    "訂單 1 的狀態",
+    "查詢訂單編號 2",
+    "3號訂單",
+    "有哪些產品",
+    "你們賣什麼",
+    "蘋果跟香蕉哪個比較適合送禮",
+    "記錄損耗 蘋果 2",
+    "你好",
+    "有哪些蘋果產品",
+]
+
+
+def _run(env, repeat: int) -> tuple[list[float], dict]:
+    executor = env.modules["agent"].agent_executor
+    latencies = []
+    by_intent: dict[str, list[float]] = {}
+    router = env.modules["intent_router"]
+    for _ in range(repeat):
+        for message in TRAFFIC:
+            config = {"configurable": {"thread_id": f"router-{uuid.uuid4().hex}"}}
+            before = router.route_stats()
+            start = time.perf_counter()
+            executor.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+            elapsed = time.perf_counter() - start
+            after = router.route_stats()
+            intent = next((k for k in after if after[k] != before.get(k, 0)), "fallback")
+            latencies.append(elapsed)
+            by_intent.setdefault(intent, []).append(elapsed)
+    return latencies, by_intent
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM latency per call (s)")
+    args = parser.parse_args(argv)
+
+    with offline_env(latency=args.latency) as env:
+        import intent_router
+        env.modules["intent_router"] = intent_router
+        results = {}
+        for enabled in (False, True):
+            intent_router.INTENT_ROUTER_ENABLED = enabled
+            intent_router.reset_route_stats()
+            env.llm.reset_calls()
+            latencies, by_intent = _run(env, args.repeat)
+            results[enabled] = (latencies, by_intent, env.llm.calls, intent_router.route_stats())
+        intent_router.INTENT_ROUTER_ENABLED = True
+
+    for enabled, (latencies, by_intent, llm_calls, stats) in results.items():
+        turns = len(latencies)
+        routed = turns - stats.get("fallback", 0) if enabled else 0
+        print(
+            f"router={'on ' if enabled else 'off'} turns={turns:<5} routed={routed / turns:6.1%}  "
+            f"mean={statistics.fmean(latencies) * 1000:8.1f}ms p50={percentile(latencies, 50) * 1000:8.1f}ms "
+            f"p90={percentile(latencies, 90) * 1000:8.1f}ms  llm/turn={llm_calls / turns:.2f}"
+        )
+        if enabled:
+            for intent, values in sorted(by_intent.items()):
+                print(f"    {intent:<13} n={len(values):<5} mean={statistics.fmean(values) * 1000:8.2f}ms")
+
+    off, on = results[False][0], results[True][0]
+    saved = statistics.fmean(off) - statistics.fmean(on)
+    print(f"mean latency saved per idle-phase turn: {saved * 1000:.1f}ms "
+          f"({saved / statistics.fmean(off):.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Fuzzy product-name resolution: accuracy and lookup latency.
+
+Builds a synthetic catalog (origin + variety + base product + spec number),
+then resolves perturbed names (homophone typo, dropped character, swapped
+characters, synonym) through product_search and through the old
+LIKE '%name%' lookup.
+
+    python -m benchmarks.bench_search --products 100000 --queries 2000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+from benchmarks.harness import offline_env, percentile
+
+ORIGINS = ["台灣", "日本", "有機", "屏東", "雲林", "美國", "紐西蘭", "嘉義", "花蓮", "宜蘭"]
+VARIETIES = ["特選", "精選", "家庭號", "小農", "產地直送", "冷藏", "鮮採", "頂級"]
+BASES = ["蘋果", "香蕉", "牛奶", "雞蛋", "白米", "鳳梨", "芭樂", "葡萄", "草莓", "西瓜",
+         "高麗菜", "番茄", "玉米", "豆腐", "醬油", "麵粉", "砂糖", "茶葉", "咖啡豆", "鮭魚"]
+HOMOPHONES = {"蘋": "平", "蕉": "焦", "奶": "乃", "蛋": "但", "米": "咪", "梨": "離",
+              "莓": "梅", "瓜": "刮", "茶": "查", "菜": "採", "茄": "加", "腐": "府",
+              "糖": "唐", "魚": "於", "麵": "面", "萄": "陶", "樂": "勒", "鳳": "奉"}
+SYNONYMS = {"牛奶": "鮮奶", "雞蛋": "蛋", "番茄": "蕃茄", "高麗菜": "包心菜"}
+
+
+def make_names(n: int, rng: random.Random) -> list[str]:
+    names = []
+    for i in range(n):
+        names.append(f"{rng.choice(ORIGINS)}{rng.choice(VARIETIES)}{rng.choice(BASES)}{i:05d}號")
+    return names
+
+
+def perturb(name: str, kind: str, rng: random.Random) -> str:
+    chars = list(name)
+    if kind == "homophone":
+        spots = [i for i, c in enumerate(chars) if c in HOMOPHONES]
+        if spots:
+            i = rng.choice(spots)
+            chars[i] = HOMOPHONES[chars[i]]
+    elif kind == "drop":
+        del chars[rng.randrange(len(chars) - 1)]
+    elif kind == "swap":
+        i = rng.randrange(len(chars) - 1)
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    elif kind == "synonym":
+        for base, alias in SYNONYMS.items():
+            if base in name:
+                return name.replace(base, alias)
+    return "".join(chars)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--like-queries", type=int, default=200, help="queries run through the LIKE baseline")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--memory", action="store_true", help="also trace index build memory (slow)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    names = make_names(args.products, rng)
+
+    with offline_env() as env:
+        import product_search
+        conn = env.modules["tools"].get_connection()
+        conn.execute("DELETE FROM product WHERE product_id > 5")
+        conn.executemany(
+            "INSERT INTO product (product_name, unit, price, stock, safety_stock, supplier, specification) VALUES (?, '件', 100, 100, 10, '', '')",
+            ((n,) for n in names),
+        )
+        conn.commit()
+        offset = 5  # seeded products come first
+
+        start = time.perf_counter()
+        index = product_search.get_index(conn)
+        build_s = time.perf_counter() - start
+        line = f"{args.products} products: index build {build_s:.2f}s"
+        if args.memory:
+            tracemalloc.start()
+            product_search.ProductIndex(list(zip(index.ids, index.names)))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            line += f", peak build memory {peak / 1024 / 1024:.1f}MB"
+        print(line)
+
+        print(f"{'perturbation':<12} {'top-1':>7} {'suggested':>10} {'p50 us':>8} {'p99 us':>8}   {'LIKE top-1':>10} {'LIKE p50 ms':>11}")
+        for kind in ["exact", "homophone", "drop", "swap", "synonym"]:
+            picks = [rng.randrange(args.products) for _ in range(args.queries)]
+            if kind == "synonym":
+                picks = [p for p in picks if any(b in names[p] for b in SYNONYMS)]
+            latencies, top1, suggested = [], 0, 0
+            queries = []
+            for p in picks:
+                query = perturb(names[p], kind, rng)
+                queries.append((p, query))
+                t0 = time.perf_counter()
+                match = index.resolve(query)
+                latencies.append(time.perf_counter() - t0)
+                expected_id = p + 1 + offset
+                if match.product_id == expected_id:
+                    top1 += 1
+                elif names[p] in match.suggestions:
+                    suggested += 1
+
+            like_hits, like_lat = 0, []
+            for p, query in queries[: args.like_queries]:
+                t0 = time.perf_counter()
+                row = conn.execute(
+                    "SELECT product_id FROM product WHERE product_name LIKE ?", (f"%{query}%",)
+                ).fetchone()
+                like_lat.append(time.perf_counter() - t0)
+                like_hits += bool(row and row[0] == p + 1 + offset)
+
+            n = len(picks) or 1
+            print(
+                f"{kind:<12} {top1 / n:>7.1%} {suggested / n:>10.1%} "
+                f"{percentile(latencies, 50) * 1e6:>8.0f} {percentile(latencies, 99) * 1e6:>8.0f}   "
+                f"{like_hits / max(len(like_lat), 1):>10.1%} {percentile(like_lat, 50) * 1000:>11.2f}"
+            )
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
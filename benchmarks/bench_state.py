@@ -0,0 +1,105 @@
+"""Per-session checkpoint size and checkpoint write time.
+
+Replays one long conversation (order flows interleaved with lookups) through
+the workflow twice: with the original setup (MemorySaver + unbounded
+add_messages) and with the current agent_executor (LatestCheckpointSaver +
+message window). Reports stored bytes per session and time spent in put().
+
+    python -m benchmarks.bench_state --rounds 10
+"""
+
+import sys
+import time
+import argparse
+from typing import Annotated
+from typing_extensions import TypedDict
+
+from langchain_core.messages import HumanMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.harness import SCENARIOS, offline_env
+
+
+def saver_bytes(saver) -> int:
+    total = 0
+    for namespaces in saver.storage.values():
+        for checkpoints in namespaces.values():
+            for checkpoint, metadata, _parent in checkpoints.values():
+                total += len(checkpoint[1]) + len(metadata[1])
+    total += sum(len(blob[1]) for blob in saver.blobs.values())
+    for writes in saver.writes.values():
+        total += sum(len(w[2][1]) for w in writes.values())
+    return total
+
+
+def timed_put(saver) -> list[float]:
+    timings = []
+    original = saver.put
+
+    def put(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    saver.put = put
+    return timings
+
+
+def replay(graph, saver, turns: list[str]) -> dict:
+    timings = timed_put(saver)
+    config = {"configurable": {"thread_id": "long-session"}}
+    sizes = []
+    for message in turns:
+        graph.invoke({"messages": [HumanMessage(content=message)]}, config=config)
+        sizes.append(saver_bytes(saver))
+    return {
+        "turns": len(turns),
+        "bytes": sizes[-1],
+        "bytes_per_turn_last": sizes[-1] - sizes[-2] if len(sizes) > 1 else sizes[-1],
+        "put_total_ms": sum(timings) * 1000,
+        "put_mean_us": sum(timings) / len(timings) * 1e6,
+        "put_last_us": sum(timings[-3:]) / 3 * 1e6,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10, help="order + lookup rounds in the session")
+    parser.add_argument("--catalog", type=int, default=200, help="filler products (size of the catalog listing)")
+    args = parser.parse_args(argv)
+
+    turns = (SCENARIOS["order"] + SCENARIOS["lookup"]) * args.rounds
+
+    with offline_env(extra_products=args.catalog) as env:
+        agent = env.modules["agent"]
+
+        FullHistoryState = TypedDict(
+            "FullHistoryState",
+            {**agent.OrderState.__annotations__, "messages": Annotated[list, add_messages]},
+        )
+        builder = StateGraph(FullHistoryState)
+        builder.add_node("process", lambda state: agent.process_message(state))
+        builder.add_edge(START, "process")
+        builder.add_edge("process", END)
+        before_saver = MemorySaver()
+        before = replay(builder.compile(checkpointer=before_saver), before_saver, turns)
+
+        after_saver = agent.LatestCheckpointSaver()
+        after_graph = agent.graph_builder.compile(checkpointer=after_saver)
+        after = replay(after_graph, after_saver, turns)
+
+    print(f"session of {len(turns)} turns, catalog={args.catalog + 5} products")
+    for name, r in (("before", before), ("after", after)):
+        print(
+            f"{name:<7} stored={r['bytes'] / 1024:>10.1f}KB  last turn +{r['bytes_per_turn_last'] / 1024:>7.1f}KB  "
+            f"put total={r['put_total_ms']:>8.2f}ms mean={r['put_mean_us']:>8.1f}us last={r['put_last_us']:>8.1f}us"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
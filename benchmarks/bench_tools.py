@@ -0,0 +1,70 @@
+"""Multi-product lookups in the general ReAct agent.
+
+Compares how a question about several products is served when the model
+emits one tool call per ReAct step ("sequential"), all calls in one step
+executed on the bounded tool pool ("parallel"), or a single call with a
+product_names list ("batched").
+
+    python -m benchmarks.bench_tools --latency 0.3 --catalog 50000
+"""
+
+import sys
+import time
+import uuid
+import argparse
+import statistics
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.harness import offline_env, percentile
+
+QUESTION = "蘋果、香蕉、牛奶、雞蛋、白米還有多少庫存"
+
+
+def run(style: str, concurrency: int, args) -> dict:
+    with offline_env(latency=args.latency, tool_call_style=style, extra_products=args.catalog) as env:
+        import intent_router
+        agent = env.modules["agent"]
+        agent.TOOL_CONCURRENCY = concurrency
+        env.queries.reset()
+        env.llm.reset_calls()
+        latencies = []
+        # 這裡量的是 ReAct agent 的工具呼叫；router 會直接回答這題，先關掉
+        intent_router.INTENT_ROUTER_ENABLED = False
+        try:
+            for _ in range(args.repeat):
+                config = {"configurable": {"thread_id": f"tools-{uuid.uuid4().hex}"}}
+                start = time.perf_counter()
+                agent.agent_executor.invoke({"messages": [HumanMessage(content=QUESTION)]}, config=config)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            intent_router.INTENT_ROUTER_ENABLED = True
+        return {
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p90_ms": percentile(latencies, 90) * 1000,
+            "llm_calls": env.llm.calls / args.repeat,
+            "queries": env.queries.count / args.repeat,
+        }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per call (s)")
+    parser.add_argument("--catalog", type=int, default=20000, help="filler products added to the catalog")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    cases = [("sequential", 1), ("parallel", 1), ("parallel", 4), ("batched", 1)]
+    print(f"question: {QUESTION}  catalog={args.catalog + 5}  llm latency={args.latency}s")
+    for style, concurrency in cases:
+        r = run(style, concurrency, args)
+        print(
+            f"{style:<10} pool={concurrency:<2} mean={r['mean_ms']:>9.2f}ms p50={r['p50_ms']:>9.2f}ms "
+            f"p90={r['p90_ms']:>9.2f}ms  llm calls={r['llm_calls']:.1f}  queries={r['queries']:.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
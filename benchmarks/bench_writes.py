@@ -0,0 +1,129 @@
+"""Order-confirmation throughput with concurrent writers.
+
+Runs confirm_order from N threads against a fresh database in four modes:
+  direct      every call opens its own connection and commits (rollback journal)
+  direct-wal  same, with the database in WAL mode
+  queued      intents go through writer.WriteQueue (single writer, group commit, WAL)
+  api         N clients each replay the order scenario through /api/chat on a
+              real uvicorn server; only the confirming turn is timed, orders/s
+              counts whole sessions; --llm-ms adds fake model latency per LLM call
+
+    python -m benchmarks.bench_writes --writers 1,4,16,64,256 --orders 2000
+    python -m benchmarks.bench_writes --modes api --writers 1,16,64 --orders 320 --llm-ms 50
+"""
+
+import sys
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.harness import ORDER_SCENARIO, offline_env, percentile
+from benchmarks.bench_replica import serve
+
+ITEMS = [{"product_name": "蘋果", "quantity": 1}, {"product_name": "牛奶", "quantity": 2}]
+
+
+def run_mode(mode: str, writers: int, orders: int, llm_latency: float = 0.0) -> dict:
+    with offline_env(latency=llm_latency) as env:
+        tools, writer = env.modules["tools"], env.modules["writer"]
+        original_run_write = tools.run_write
+
+        def direct_write(fn):
+            conn = tools.get_connection()
+            try:
+                result = fn(conn)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        if mode.startswith("direct"):
+            tools.run_write = direct_write
+            if mode == "direct-wal":
+                conn = tools.get_connection()
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.close()
+        else:
+            writer.get_writer()  # start the writer thread outside the timed section
+
+        per_writer = max(1, orders // writers)
+        server = None
+
+        def worker(_):
+            latencies, ok = [], 0
+            for _ in range(per_writer):
+                start = time.perf_counter()
+                result = tools.confirm_order.invoke({
+                    "customer_name": "王大明",
+                    "items": ITEMS,
+                    "delivery_method": "專車",
+                    "payment_method": "現金",
+                })
+                latencies.append(time.perf_counter() - start)
+                ok += result.startswith("✅")
+            return latencies, ok
+
+        def api_worker(_):
+            latencies, ok = [], 0
+            with httpx.Client(base_url=base_url, timeout=None) as client:
+                for _ in range(per_writer):
+                    session_id = f"writes-{uuid.uuid4().hex}"
+                    for message in ORDER_SCENARIO[:-1]:
+                        client.post("/api/chat", json={"message": message, "session_id": session_id}).raise_for_status()
+                    start = time.perf_counter()
+                    res = client.post("/api/chat", json={"message": ORDER_SCENARIO[-1], "session_id": session_id})
+                    latencies.append(time.perf_counter() - start)
+                    ok += "訂單建立成功" in res.json()["reply"]
+            return latencies, ok
+
+        if mode == "api":
+            server, base_url = serve(env.modules["main"].app)
+        fn = api_worker if mode == "api" else worker
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=writers) as pool:
+                results = list(pool.map(fn, range(writers)))
+            elapsed = time.perf_counter() - start
+        finally:
+            tools.run_write = original_run_write
+            if server is not None:
+                server.should_exit = True
+
+        latencies = [lat for lats, _ in results for lat in lats]
+        ok = sum(n for _, n in results)
+        w = writer.get_writer() if mode in ("queued", "api") else None
+        return {
+            "orders_per_s": ok / elapsed,
+            "failed": len(latencies) - ok,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "batch": (w.intents / w.batches) if w and w.batches else 1.0,
+        }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,4,16,64,256")
+    parser.add_argument("--orders", type=int, default=2000, help="orders per run, split across writers")
+    parser.add_argument("--modes", default="direct,direct-wal,queued,api")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="fake LLM latency per call (api mode)")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<11} {'writers':>7} {'orders/s':>9} {'failed':>7} {'p50 ms':>8} {'p99 ms':>9} {'avg batch':>9}")
+    for writers in [int(w) for w in args.writers.split(",")]:
+        for mode in args.modes.split(","):
+            r = run_mode(mode, writers, args.orders, args.llm_ms / 1000)
+            print(f"{mode:<11} {writers:>7} {r['orders_per_s']:>9.0f} {r['failed']:>7} "
+                  f"{r['p50_ms']:>8.2f} {r['p99_ms']:>9.2f} {r['batch']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Deterministic stand-in for ChatGroq used by the offline benchmarks.
+
+FakeChatGroq never touches the network. Structured-output calls are answered
+by small rule-based parsers keyed on the Pydantic schema name, and the ReAct
+agent gets scripted tool calls derived from keywords in the last human
+message. Every call sleeps for a configurable latency so that benchmark
+numbers include a realistic "model time" component.
+"""
+
+import re
+import time
+import random
+import threading
+import itertools
+from typing import Any, Callable, Literal
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import ConfigDict, PrivateAttr
+
+DEFAULT_PRODUCT_NAMES = ["蘋果", "香蕉", "牛奶", "雞蛋", "白米"]
+
+
+# ============ Structured-output parsers ============
+
+def parse_customer_info(prompt: str) -> dict:
+    """「名稱，地址，電話」 → CustomerInfo fields."""
+    msg = prompt.split("訊息：")[-1]
+    parts = [p.strip() for p in re.split(r"[，,、\s]+", msg) if p.strip()]
+    phone = next((p for p in parts if re.fullmatch(r"0\d{8,9}", p)), "")
+    rest = [p for p in parts if p != phone]
+    name = rest[0] if rest else ""
+    address = rest[1] if len(rest) > 1 else ""
+    return {"customer_name": name, "customer_address": address, "customer_phone": phone}
+
+
+def parse_order_items(prompt: str) -> dict:
+    """「蘋果*2 牛奶*3」 → OrderItems fields (only the user's part is parsed)."""
+    msg = prompt.split("用戶說：")[-1] if "用戶說：" in prompt else prompt.split("訊息：")[-1]
+    items = [
+        {"product_name": name, "quantity": int(qty)}
+        for name, qty in re.findall(r"([^\s\*,，、0-9]+)\s*[\*x×]\s*(\d+)", msg)
+    ]
+    return {"items": items}
+
+
+def parse_delivery_info(prompt: str) -> dict:
+    msg = prompt.split("訊息：")[-1]
+    delivery = "郵寄" if "郵寄" in msg else "專車"
+    payment = next((p for p in ["貨到付款", "匯款", "現金"] if p in msg), "現金")
+    return {"delivery_method": delivery, "payment_method": payment}
+
+
+DEFAULT_STRUCTURED_PARSERS: dict[str, Callable[[str], dict]] = {
+    "CustomerInfo": parse_customer_info,
+    "OrderItems": parse_order_items,
+    "DeliveryInfo": parse_delivery_info,
+}
+
+
+# ============ Scripted tool selection ============
+
+def scripted_tool_calls(text: str, product_names: list[str], batch: bool = False) -> list[dict]:
+    """Pick the tool calls a well-behaved model would emit for a human message.
+
+    Several products in one question become parallel calls, or a single call
+    with a product_names list when `batch` is set.
+    """
+    order_match = re.search(r"訂單\s*(?:編號)?\s*(\d+)", text)
+    if order_match:
+        return [{"name": "query_orders", "args": {"order_id": int(order_match.group(1))}}]
+
+    mentioned = [name for name in product_names if name in text]
+    if "損耗" in text and mentioned:
+        qty = re.search(r"(\d+)", text)
+        return [{
+            "name": "record_wastage",
+            "args": {"product_name": mentioned[0], "loss_quantity": int(qty.group(1)) if qty else 1},
+        }]
+    tool_name = "check_stock" if "庫存" in text else "query_products"
+    if mentioned and batch and len(mentioned) > 1:
+        return [{"name": tool_name, "args": {"product_names": mentioned}}]
+    if mentioned:
+        return [{"name": tool_name, "args": {"product_name": n}} for n in mentioned]
+    if "產品" in text or "商品" in text:
+        return [{"name": "query_products", "args": {"product_name": ""}}]
+    return []
+
+
+class FakeChatGroq(BaseChatModel):
+    """Chat model with canned answers and a fixed per-call latency.
+
+    latency / jitter are in seconds. `calls` counts every model invocation
+    (ReAct steps and structured extractions) and is safe to read from the
+    benchmark threads. tool_call_style controls multi-product questions:
+    "parallel" emits every call in one step, "batched" emits one call with a
+    list argument and "sequential" emits one call per ReAct iteration.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+    tool_call_style: Literal["parallel", "batched", "sequential"] = "parallel"
+    product_names: list[str] = DEFAULT_PRODUCT_NAMES
+    structured_parsers: dict[str, Callable[[str], dict]] = DEFAULT_STRUCTURED_PARSERS
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _rng: random.Random = PrivateAttr(default=None)
+    _ids: Any = PrivateAttr(default_factory=itertools.count)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls = 0
+
+    def _sleep(self) -> None:
+        with self._lock:
+            self._calls += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatGroq":
+        return self
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        parser = self.structured_parsers[schema.__name__]
+
+        def _invoke(prompt: Any) -> Any:
+            self._sleep()
+            text = prompt if isinstance(prompt, str) else str(prompt)
+            return schema(**parser(text))
+
+        return RunnableLambda(_invoke)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._sleep()
+        human_text, tool_outputs = "", []
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                human_text = str(m.content)
+                break
+            if isinstance(m, ToolMessage):
+                tool_outputs.insert(0, str(m.content))
+
+        calls = scripted_tool_calls(human_text, self.product_names, batch=self.tool_call_style == "batched")
+        if self.tool_call_style == "sequential":
+            pending = calls[len(tool_outputs):]
+            calls = pending[:1]
+        elif tool_outputs:
+            calls = []
+
+        if calls:
+            with self._lock:
+                tool_calls = [
+                    {"name": c["name"], "args": c["args"], "id": f"call_{next(self._ids)}", "type": "tool_call"}
+                    for c in calls
+                ]
+            message = AIMessage(content="", tool_calls=tool_calls)
+        elif tool_outputs:
+            # Final answer: summarise every tool result since the last human turn
+            message = AIMessage(content="\n\n".join(tool_outputs))
+        else:
+            message = AIMessage(content="您好，請問需要查詢產品、庫存、訂單，或是要下單呢？")
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
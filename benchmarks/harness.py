@@ -0,0 +1,260 @@
+"""Shared plumbing for the offline benchmarks.
+
+`offline_env()` points the app at a throw-away SQLite file, seeds it, swaps
+the Groq client in agent.py for FakeChatGroq and wraps get_connection so
+every executed statement is counted. Nothing here needs network access.
+"""
+
+import os
+import atexit
+import shutil
+import sqlite3
+import tempfile
+import threading
+import statistics
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+import database  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatGroq  # noqa: E402
+
+# BENCH_SCALE="orders=1000000,customers=50000,products=5000"：offline_env 改用 scale_data.py 產生的大量資料
+BENCH_SCALE = os.getenv("BENCH_SCALE", "")
+
+
+# ============ Scenarios ============
+
+ORDER_SCENARIO = [
+    "我要下單",
+    "王大明，台北市信義區信義路五段7號，0912345678",
+    "確認",
+    "蘋果*2 牛奶*3",
+    "確認",
+    "專車 貨到付款",
+    "確認",
+]
+
+LOOKUP_SCENARIO = [
+    "蘋果多少錢",
+    "蘋果、香蕉、牛奶還有多少庫存",
+    "訂單 1 的狀態",
+    "有哪些產品",
+]
+
+MODIFY_SCENARIO = [
+    "我要訂購",
+    "李小華，台中市西屯區台灣大道四段1號，0923456789",
+    "確認",
+    "香蕉*1",
+    "改成 香蕉*2 雞蛋*1",
+    "確認",
+    "郵寄 匯款",
+    "確認",
+]
+
+SCENARIOS = {
+    "order": ORDER_SCENARIO,
+    "lookup": LOOKUP_SCENARIO,
+    "modify": MODIFY_SCENARIO,
+}
+
+# 每個情境最後一輪回覆必須包含的文字；跑得快但流程壞掉的改動要能被擋下來
+SCENARIO_OUTCOMES = {
+    "order": "訂單建立成功",
+    "modify": "訂單建立成功",
+}
+ERROR_REPLY = "系統處理時發生錯誤"
+
+
+def check_replies(scenario: str, replies: list[str]) -> list[str]:
+    """Functional problems in one replayed session (empty list = OK)."""
+    problems = [f"{scenario}: turn {i + 1} replied with an error: {r[:80]}"
+                for i, r in enumerate(replies) if ERROR_REPLY in r]
+    expected = SCENARIO_OUTCOMES.get(scenario)
+    if expected and (not replies or expected not in replies[-1]):
+        last = replies[-1][:80] if replies else ""
+        problems.append(f"{scenario}: last reply lacks 「{expected}」: {last}")
+    return problems
+
+
+# ============ Query counting ============
+
+class QueryCounter:
+    """Counts SQL statements executed through the wrapped get_connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _trace(self, statement: str) -> None:
+        with self._lock:
+            self.count += 1
+
+    def wrap(self, get_connection):
+        def counted_connection() -> sqlite3.Connection:
+            conn = get_connection()
+            conn.set_trace_callback(self._trace)
+            return conn
+
+        counted_connection.__wrapped__ = get_connection
+        return counted_connection
+
+    def reset(self) -> None:
+        with self._lock:
+            self.count = 0
+
+
+@dataclass
+class OfflineEnv:
+    llm: FakeChatGroq
+    queries: QueryCounter
+    db_path: str
+    modules: dict = field(default_factory=dict)
+
+
+def _patch_connections(counter: QueryCounter, modules: list) -> list:
+    patched = []
+    for module in modules:
+        original = getattr(module, "get_connection", None)
+        if original is None:
+            continue
+        setattr(module, "get_connection", counter.wrap(original))
+        patched.append((module, original))
+    return patched
+
+
+_scale_templates: dict[str, str] = {}
+
+
+def _load_scale_data(db_path: str, spec: str) -> None:
+    """Copy a generated database over db_path; each spec is generated once per process."""
+    template = _scale_templates.get(spec)
+    if template is None:
+        from scale_data import generate_scale_data
+
+        kwargs = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, value = item.split("=", 1)
+            kwargs[key.strip()] = int(value) if value.strip().isdigit() else value.strip()
+        template_dir = tempfile.mkdtemp(prefix="bench-scale-")
+        atexit.register(shutil.rmtree, template_dir, True)
+        template = os.path.join(template_dir, "product.db")
+        database.DB_PATH = template
+        try:
+            generate_scale_data(**kwargs)
+        finally:
+            database.DB_PATH = db_path
+        _scale_templates[spec] = template
+    shutil.copyfile(template, db_path)
+
+
+@contextmanager
+def offline_env(
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    seed: int = 0,
+    stock: int = 1_000_000,
+    tool_call_style: str = "parallel",
+    extra_products: int = 0,
+):
+    """Temporary DB + fake LLM + query counting, restored on exit.
+
+    extra_products pads the catalog with filler rows so LIKE scans cost
+    something closer to a real catalog. With BENCH_SCALE set, the database
+    starts from scale_data.generate_scale_data() instead of the 3-customer /
+    5-product seed.
+    """
+    tmpdir = tempfile.TemporaryDirectory(prefix="bench-")
+    db_path = os.path.join(tmpdir.name, "product.db")
+    original_db_path = database.DB_PATH
+    database.DB_PATH = db_path
+
+    database.init_db()
+    database.seed_sample_data()
+    if BENCH_SCALE:
+        _load_scale_data(db_path, BENCH_SCALE)
+    conn = database.get_connection()
+    # Large stock so long runs never fall into the 庫存不足 branch
+    conn.execute("UPDATE product SET stock = ?", (stock,))
+    if extra_products:
+        conn.executemany(
+            "INSERT INTO product (product_name, unit, price, stock, safety_stock, supplier, specification) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"填充品項{i:07d}", "件", 100, stock, 10, "填充供應商", "") for i in range(extra_products)),
+        )
+    conn.commit()
+    conn.close()
+
+    import agent
+    import tools
+    import main
+    import catalog
+    import writer
+    import customers
+    import archive
+    import replica
+    fake = FakeChatGroq(latency=latency, jitter=jitter, seed=seed, tool_call_style=tool_call_style)
+    original_llm, original_general = agent.llm, agent.general_agent
+    agent.llm = fake
+    agent.general_agent = agent.build_general_agent(fake)
+
+    counter = QueryCounter()
+    patched = _patch_connections(counter, [tools, main, catalog, writer, customers, archive, replica])
+    try:
+        yield OfflineEnv(llm=fake, queries=counter, db_path=db_path,
+                         modules={"agent": agent, "tools": tools, "main": main,
+                                  "catalog": catalog, "writer": writer, "customers": customers,
+                                  "archive": archive, "replica": replica})
+    finally:
+        replica.close_replica()
+        for module, original in patched:
+            module.get_connection = original
+        agent.llm, agent.general_agent = original_llm, original_general
+        database.DB_PATH = original_db_path
+        tmpdir.cleanup()
+
+
+# ============ Statistics ============
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies: list[float], elapsed: float, turns: int, queries: int, llm_calls: int,
+              failures: list[str] | None = None) -> dict:
+    return {
+        "turns": turns,
+        "failures": list(failures or []),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_tps": round(turns / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p90": round(percentile(latencies, 90) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(max(latencies) * 1000, 3) if latencies else 0.0,
+        },
+        "queries_per_turn": round(queries / turns, 3) if turns else 0.0,
+        "llm_calls_per_turn": round(llm_calls / turns, 3) if turns else 0.0,
+    }
+
+
+def format_summary(name: str, summary: dict) -> str:
+    lat = summary["latency_ms"]
+    line = (
+        f"{name:<28} turns={summary['turns']:<6} {summary['throughput_tps']:>9.2f} turn/s  "
+        f"p50={lat['p50']:>8.2f}ms p90={lat['p90']:>8.2f}ms p99={lat['p99']:>8.2f}ms  "
+        f"q/turn={summary['queries_per_turn']:<6} llm/turn={summary['llm_calls_per_turn']}"
+    )
+    if "alloc_kb_per_turn" in summary:
+        line += f"  alloc={summary['alloc_kb_per_turn']}KB/turn"
+    if summary.get("failures"):
+        line += f"  FAILURES={len(summary['failures'])}"
+    return line
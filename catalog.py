@@ -0,0 +1,124 @@
+import gzip
+import json
+import hashlib
+import threading
+from functools import cached_property
+
+import database
+from database import get_connection
+
+# 對話中最多列出的產品數，其餘請客戶到 /products 頁面查看
+CATALOG_CHAT_LIMIT = 50
+
+
+def format_product_line(r) -> str:
+    return (
+        f"產品ID: {r['product_id']}, 名稱: {r['product_name']}, "
+        f"價格: {r['price']}元/{r['unit']}, 庫存: {r['stock']}{r['unit']}, "
+        f"供應商: {r['supplier']}, 規格: {r['specification']}"
+    )
+
+
+class RenderedCatalog:
+    """Immutable rendering of the product table at one catalog version.
+
+    Each representation is built on first use and then reused until the
+    version changes.
+    """
+
+    def __init__(self, version: int, rows: list[dict], db_path: str = ""):
+        self.version = version
+        self.rows = rows
+        self.db_path = db_path
+
+    @cached_property
+    def lines(self) -> list[str]:
+        return [format_product_line(r) for r in self.rows]
+
+    @cached_property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @cached_property
+    def json_body(self) -> bytes:
+        return json.dumps(self.page(), ensure_ascii=False).encode("utf-8")
+
+    @cached_property
+    def gzip_body(self) -> bytes:
+        return gzip.compress(self.json_body, compresslevel=6)
+
+    @cached_property
+    def etag(self) -> str:
+        return '"catalog-%d-%s"' % (self.version, hashlib.md5(self.json_body).hexdigest()[:12])
+
+    def filter(self, supplier: str = "", keyword: str = "") -> list[int]:
+        """Indexes of rows matching the supplier / name keyword filters."""
+        keyword = keyword.lower()
+        return [
+            i for i, r in enumerate(self.rows)
+            if (not supplier or r["supplier"] == supplier)
+            and (not keyword or keyword in r["product_name"].lower())
+        ]
+
+    def page(self, page: int = 1, page_size: int = 0, supplier: str = "", keyword: str = "") -> dict:
+        """JSON-ready page of products. page_size=0 returns everything."""
+        indexes = self.filter(supplier, keyword) if supplier or keyword else range(len(self.rows))
+        total = len(indexes)
+        if page_size > 0:
+            start = (max(page, 1) - 1) * page_size
+            indexes = indexes[start:start + page_size]
+        return {
+            "version": self.version,
+            "total": total,
+            "page": max(page, 1),
+            "page_size": page_size,
+            "rows": [self.rows[i] for i in indexes],
+        }
+
+    def render_text(self, limit: int = 0) -> str:
+        """Chat listing; with a limit, the remainder is summarised in one line."""
+        if not limit or len(self.lines) <= limit:
+            return self.text
+        return "\n".join(self.lines[:limit]) + f"\n…（共 {len(self.lines)} 項產品，其餘請到產品列表頁面查看）"
+
+    def render_page_text(self, page: int = 1, supplier: str = "", page_size: int = CATALOG_CHAT_LIMIT) -> str:
+        """One page of the chat listing (optionally one supplier), with a footer when more pages exist."""
+        indexes = self.filter(supplier) if supplier else range(len(self.rows))
+        total = len(indexes)
+        pages = max(1, -(-total // page_size))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * page_size
+        lines = [self.lines[i] for i in indexes[start:start + page_size]]
+        if pages > 1:
+            lines.append(f"…（第 {page}/{pages} 頁，共 {total} 項產品；可指定 page 查看其他頁，或到產品列表頁面查看）")
+        return "\n".join(lines)
+
+
+_lock = threading.Lock()
+_current: RenderedCatalog | None = None
+
+
+def catalog_version(conn) -> int:
+    row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def get_catalog() -> RenderedCatalog:
+    """Current RenderedCatalog; the product table is only re-read when the
+    version bumped by the product triggers (see database.init_db) changes."""
+    global _current
+    conn = get_connection()
+    try:
+        version = catalog_version(conn)
+        cached = _current
+        if cached is not None and (cached.db_path, cached.version) == (database.DB_PATH, version):
+            return cached
+        with _lock:
+            cached = _current
+            if cached is not None and (cached.db_path, cached.version) == (database.DB_PATH, version):
+                return cached
+            rows = conn.execute("SELECT * FROM product ORDER BY product_id").fetchall()
+            _current = RenderedCatalog(version, [dict(r) for r in rows], database.DB_PATH)
+            return _current
+    finally:
+        conn.close()
@@ -0,0 +1,66 @@
+import re
+
+from database import get_connection
+
+# 手機 09xx-xxx-xxx 或市話 0x-xxxxxxxx（允許空白/連字號）
+_PHONE = re.compile(r"(?<!\d)(0\d[\d\- ]{7,11}\d)(?!\d)")
+_NAME = re.compile(r"(?:我是|我叫|本人是?|名字是|名稱是?|客戶)[:：\s]*([一-鿿A-Za-z]{2,10}?)(?=[，,。\s]|電話|$)")
+
+
+def normalize_phone(phone: str) -> str:
+    """Digits as stored in customer.customer_phone (no dashes / spaces)."""
+    return re.sub(r"[\- ]", "", phone or "")
+
+
+def extract_phone(text: str) -> str | None:
+    match = _PHONE.search(text or "")
+    return normalize_phone(match.group(1)) if match else None
+
+
+def mask_phone(phone: str) -> str:
+    """Only the last 3 digits, e.g. 0912345678 → *******678."""
+    phone = phone or ""
+    return "*" * max(len(phone) - 3, 0) + phone[-3:]
+
+
+_CITY_DISTRICT = re.compile(r"^(.{2,3}?[市縣])(.{1,3}?[區鄉鎮市](?![區鄉鎮市]))?")
+
+
+def mask_address(address: str) -> str:
+    """City / district only, e.g. 台北市信義區信義路五段7號 → 台北市信義區…"""
+    match = _CITY_DISTRICT.match(address or "")
+    return f"{match.group(0)}…" if match else "（已登記的地址）"
+
+
+def extract_name(text: str, bare: bool = False) -> str | None:
+    """Name after 「我是 / 我叫 / 名字是…」; with bare, also a lone name next
+    to the phone number (「王大明 0912345678」)."""
+    match = _NAME.search(text or "")
+    if match:
+        return match.group(1)
+    if bare:
+        rest = re.sub(r"電話|手機|[\s,，、。:：]+", " ", _PHONE.sub(" ", text or "")).split()
+        if len(rest) == 1 and re.fullmatch(r"[一-鿿A-Za-z]{2,10}", rest[0]):
+            return rest[0]
+    return None
+
+
+def find_customer(phone: str = "", name: str = "") -> dict | None:
+    """Stored profile by phone (idx_customer_phone) and/or name (idx_customer_name).
+
+    A phone shared by several customers is ambiguous unless the name is
+    given too.
+    """
+    conditions = [(c, v) for c, v in (("customer_phone", normalize_phone(phone)), ("customer_name", name)) if v]
+    if not conditions:
+        return None
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"""SELECT customer_id, customer_name, customer_address, customer_phone FROM customer
+                WHERE {" AND ".join(f"{c} = ?" for c, _ in conditions)} LIMIT 2""",
+            [v for _, v in conditions],
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows[0]) if len(rows) == 1 else None
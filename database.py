@@ -1,11 +1,17 @@
 import sqlite3
 import os
+import logging
+
+import db_profile
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "product.db")
 
 
 def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    # DB_PROFILE=1 時改用會計時每個 statement 的連線（db_profile.py）
+    conn = sqlite3.connect(DB_PATH, factory=db_profile.connection_factory())
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
@@ -54,9 +60,14 @@ def init_db():
             delivery_method TEXT NOT NULL,
             payment_method  TEXT NOT NULL,
             total_price     REAL NOT NULL DEFAULT 0,
-            is_delivered    INTEGER NOT NULL DEFAULT 0
+            is_delivered    INTEGER NOT NULL DEFAULT 0,
+            created_at      TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    # 舊資料庫補上建立時間（既有訂單為 NULL，封存時視為已超過期限）
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(orders)")}
+    if "created_at" not in columns:
+        cursor.execute("ALTER TABLE orders ADD COLUMN created_at TEXT")
 
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS customer_order_detail (
@@ -71,11 +82,78 @@ def init_db():
             FOREIGN KEY (order_id)    REFERENCES orders(order_id)
         )
     """)
+    # 依訂單查明細 / 封存時依訂單搬移
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detail_order ON customer_order_detail(order_id)")
+
+    # 產品目錄版本：product 有任何新增/修改/刪除時 +1，供 catalog.py 判斷是否需要重建
+    # names_version 只在產品名稱變動時 +1，供 product_search.py 的名稱索引使用
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id            INTEGER PRIMARY KEY CHECK (id = 1),
+            version       INTEGER NOT NULL DEFAULT 0,
+            names_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(catalog_version)")}
+    if "names_version" not in columns:
+        cursor.execute("ALTER TABLE catalog_version ADD COLUMN names_version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS product_catalog_{event.lower()}
+            AFTER {event} ON product
+            BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        """)
+    for name, event in (("insert", "INSERT"), ("update", "UPDATE OF product_name"), ("delete", "DELETE")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS product_names_{name}
+            AFTER {event} ON product
+            BEGIN
+                UPDATE catalog_version SET names_version = names_version + 1 WHERE id = 1;
+            END
+        """)
+
+    # 客戶以名稱為唯一鍵（register_customer 用 UPSERT）；唯一索引還不存在時才做一次性的同名合併
+    has_unique_name = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_customer_name'"
+    ).fetchone()
+    if not has_unique_name:
+        _merge_duplicate_customers(cursor)
+        cursor.execute("CREATE UNIQUE INDEX idx_customer_name ON customer(customer_name)")
+    # 老客戶用電話辨識；電話一律存成純數字（與 customers.normalize_phone 相同），舊資料補正
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customer_phone ON customer(customer_phone)")
+    cursor.execute("""
+        UPDATE customer SET customer_phone = REPLACE(REPLACE(customer_phone, '-', ''), ' ', '')
+        WHERE customer_phone GLOB '*[- ]*'
+    """)
 
     conn.commit()
     conn.close()
 
 
+def _merge_duplicate_customers(cursor) -> None:
+    """One-off migration before idx_customer_name exists: customers sharing
+    a name are merged into the lowest customer_id (order lines re-pointed,
+    the other rows deleted), each merge logged."""
+    duplicates = cursor.execute("""
+        SELECT customer_name, MIN(customer_id), COUNT(*) FROM customer
+        GROUP BY customer_name HAVING COUNT(*) > 1
+    """).fetchall()
+    for customer_name, keep_id, count in duplicates:
+        moved = cursor.execute(
+            """UPDATE customer_order_detail SET customer_id = ?
+               WHERE customer_id IN (SELECT customer_id FROM customer WHERE customer_name = ? AND customer_id != ?)""",
+            (keep_id, customer_name, keep_id),
+        ).rowcount
+        cursor.execute("DELETE FROM customer WHERE customer_name = ? AND customer_id != ?", (customer_name, keep_id))
+        logger.warning(
+            f"Migration: merged {count - 1} duplicate customer(s) named {customer_name!r} into "
+            f"customer_id {keep_id} ({moved} order lines re-pointed)"
+        )
+
+
 def seed_sample_data():
     conn = get_connection()
     count = conn.execute("SELECT COUNT(*) FROM customer").fetchone()[0]
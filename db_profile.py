@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import nullcontext
+from functools import wraps
+from inspect import iscoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+# ============ 設定 ============
+
+# 統計每個 SQL statement 的執行時間（get_connection 建立連線時決定，已開啟的連線不受影響）
+DB_PROFILE = os.getenv("DB_PROFILE", "0") != "0"
+# 超過這個時間（毫秒）的查詢連同 EXPLAIN QUERY PLAN 記到 log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG_SIZE = 100
+# /api/chat 與管理端點有多少比例的請求做 sampling profile（0 = 關閉）
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+
+_PLANNED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+# ============ Query scopes ============
+
+class QueryScope:
+    """Counts the statements executed while it is the current scope.
+
+    Scopes nest (an HTTP request contains graph turns); a statement counts
+    toward the current scope and all of its parents. The current scope is
+    a ContextVar, so it follows the request into the FastAPI threadpool and
+    LangGraph's executor; writer.submit() carries it to the writer thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.parent: QueryScope | None = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self._token = None
+        self._start = 0.0
+
+    def add(self, elapsed_ms: float) -> None:
+        scope = self
+        while scope is not None:
+            scope.queries += 1
+            scope.db_ms += elapsed_ms
+            scope = scope.parent
+
+    def __enter__(self) -> "QueryScope":
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        with _stats_lock:
+            totals = _scope_totals.setdefault(self.name, {"count": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0})
+            totals["count"] += 1
+            totals["queries"] += self.queries
+            totals["db_ms"] += self.db_ms
+            totals["max_queries"] = max(totals["max_queries"], self.queries)
+        logger.debug(f"{self.name}: {self.queries} queries, {self.db_ms:.1f}ms in SQLite, {elapsed_ms:.1f}ms total")
+
+
+_current: contextvars.ContextVar[QueryScope | None] = contextvars.ContextVar("db_query_scope", default=None)
+_NO_SCOPE = nullcontext()
+
+
+def query_scope(name: str):
+    """Context manager counting queries under `name` (a no-op when DB_PROFILE is off)."""
+    return QueryScope(name) if DB_PROFILE else _NO_SCOPE
+
+
+def current_scope() -> QueryScope | None:
+    return _current.get()
+
+
+def bind_scope(fn, scope: QueryScope):
+    """Wrap `fn` so it runs with `scope` as the current scope (for work handed to another thread)."""
+    def bound(*args, **kwargs):
+        token = _current.set(scope)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return bound
+
+
+# ============ Statistics ============
+
+_stats_lock = threading.Lock()
+_totals = {"queries": 0, "db_ms": 0.0, "slow": 0}
+_scope_totals: dict[str, dict] = {}
+_slow_queries: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+
+def _record(cursor: sqlite3.Cursor, sql: str, params, elapsed_ms: float, many: bool) -> None:
+    scope = _current.get()
+    if scope is not None:
+        scope.add(elapsed_ms)
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    with _stats_lock:
+        _totals["queries"] += 1
+        _totals["db_ms"] += elapsed_ms
+        _totals["slow"] += slow
+    if not slow:
+        return
+    statement = " ".join(sql.split())
+    # executemany 的參數已被消耗，無法重現查詢計畫
+    plan = "(executemany)" if many else explain(cursor.connection, sql, params)
+    entry = {
+        "sql": statement,
+        "ms": round(elapsed_ms, 3),
+        "scope": scope.name if scope is not None else None,
+        "plan": plan,
+        "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with _stats_lock:
+        _slow_queries.append(entry)
+    logger.warning(f"Slow query {elapsed_ms:.1f}ms [{entry['scope'] or '-'}]: {statement}" + (f"\n{plan}" if plan else ""))
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> str:
+    """EXPLAIN QUERY PLAN of one statement as an indented tree."""
+    if not sql.lstrip().upper().startswith(_PLANNED):
+        return ""
+    try:
+        # 用基本的 sqlite3.Cursor，避免 EXPLAIN 本身又被計入
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except sqlite3.Error as e:
+        return f"(plan unavailable: {e})"
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append(f"{'  ' * (depth[node_id] + 1)}{detail}")
+    return "\n".join(lines)
+
+
+def stats() -> dict:
+    """Totals since start-up, per-scope averages and the most recent slow queries."""
+    with _stats_lock:
+        scopes = {
+            name: {
+                **t,
+                "db_ms": round(t["db_ms"], 3),
+                "queries_avg": round(t["queries"] / t["count"], 2),
+                "db_ms_avg": round(t["db_ms"] / t["count"], 3),
+            }
+            for name, t in sorted(_scope_totals.items())
+        }
+        return {
+            "enabled": DB_PROFILE,
+            "slow_query_ms": SLOW_QUERY_MS,
+            "profile_sample_rate": PROFILE_SAMPLE_RATE,
+            "queries": _totals["queries"],
+            "db_ms": round(_totals["db_ms"], 3),
+            "slow": _totals["slow"],
+            "scopes": scopes,
+            "slow_queries": list(_slow_queries),
+        }
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _totals.update(queries=0, db_ms=0.0, slow=0)
+        _scope_totals.clear()
+        _slow_queries.clear()
+
+
+# ============ Instrumented connection ============
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including the fetches that run it.
+
+    A statement is recorded when the cursor moves on: the next execute,
+    the last fetch, close() or garbage collection.
+    """
+
+    _sql = None
+    _params = ()
+    _many = False
+    _elapsed = 0.0
+
+    def _track(self, sql: str, params, many: bool, start: float) -> None:
+        self._sql, self._params, self._many = sql, params, many
+        self._elapsed = time.perf_counter() - start
+
+    def _finish(self) -> None:
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        _record(self, sql, self._params, self._elapsed * 1000, self._many)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._track(sql, parameters, False, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._track(sql, (), True, start)
+
+    def executescript(self, sql_script):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._track(sql_script, (), True, start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - start
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3.Connection whose cursors are ProfiledCursor."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connection_factory() -> type[sqlite3.Connection]:
+    """Connection class for database.get_connection()."""
+    return ProfiledConnection if DB_PROFILE else sqlite3.Connection
+
+
+# ============ Sampling profiler ============
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds.
+
+    Output is the collapsed-stack format ("frame;frame;frame count" per
+    line) read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-profiler", daemon=True)
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, name: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+class _RequestProfile:
+    """Query scope plus, for a sampled request, a SamplingProfiler on the current thread."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.scope = query_scope(name)
+        self.profiler = None
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            self.profiler = SamplingProfiler(threading.get_ident())
+
+    def __enter__(self):
+        self.scope.__enter__()
+        if self.profiler is not None:
+            self.profiler.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.profiler is not None:
+            self.profiler.__exit__(*exc)
+        # 比取樣間隔還短的請求沒有樣本，不寫檔
+        if self.profiler is not None and self.profiler.samples:
+            try:
+                path = self.profiler.write(self.name)
+                logger.info(f"Profile of {self.name} ({sum(self.profiler.samples.values())} samples) written to {path}")
+            except OSError as e:
+                logger.warning(f"Could not write profile for {self.name}: {e}")
+        self.scope.__exit__(*exc)
+
+
+def profiled(name: str):
+    """Endpoint decorator: per-request query counting and sampled profiling.
+
+    Works on both def and async def endpoints and keeps the signature
+    FastAPI inspects. With DB_PROFILE off and PROFILE_SAMPLE_RATE 0 it
+    only adds one function call.
+    """
+    def decorate(fn):
+        if iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not (DB_PROFILE or PROFILE_SAMPLE_RATE):
+                    return await fn(*args, **kwargs)
+                with _RequestProfile(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (DB_PROFILE or PROFILE_SAMPLE_RATE):
+                return fn(*args, **kwargs)
+            with _RequestProfile(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,164 @@
+import os
+import re
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+from catalog import CATALOG_CHAT_LIMIT, get_catalog
+from product_search import get_index
+from tools import check_stock, query_orders, query_products
+
+logger = logging.getLogger(__name__)
+
+# 不經 LLM 直接處理的常見查詢；設 INTENT_ROUTER=0 可關閉，全部交給 ReAct agent
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1") != "0"
+
+# 產品名稱比對分數門檻：0.9 以上代表完全相同、別名、唯一包含或同音，模糊比對的結果交給 agent
+# 同時包含在多項產品名稱中的查詢（如「芒果」）列出全部符合的產品，超過 ROUTER_MAX_PRODUCTS 項則交給 agent
+ROUTER_MIN_SCORE = 0.9
+ROUTER_MAX_PRODUCTS = 10
+# 太長的訊息通常包含多個問題，交給 agent
+ROUTER_MAX_LENGTH = 40
+# 訂單編號是 SQLite INTEGER，超出範圍（或 0）的不直接查，交給 agent
+_MAX_ORDER_ID = 2 ** 63
+
+_ORDER_ID = re.compile(r"(?:訂單|單號)\s*(?:編號|號碼|號)?\s*[#:]?\s*(\d+)|#?(\d+)\s*號?訂單")
+_CATALOG = re.compile(
+    r"(?:有哪些|有什麼|有甚麼|列出|所有|全部)(?:的)?(?:產品|商品|品項)"
+    r"|(?:產品|商品)(?:列表|清單|目錄)"
+    r"|賣(?:什麼|甚麼|哪些)"
+)
+_PRICE_WORDS = ("多少錢", "價格", "價錢", "售價", "單價", "幾元", "幾塊")
+_STOCK_WORDS = ("庫存", "還有多少", "還有幾", "剩多少", "剩幾", "有沒有貨", "有貨")
+_ARCHIVE_WORDS = ("封存", "歷史", "以前", "之前", "舊訂單")
+# 查詢以外的動作（取消、修改、損耗…）一律交給 agent
+_ACTION_WORDS = ("取消", "修改", "更改", "改成", "刪除", "損耗", "退貨", "退款", "下單", "訂購")
+
+_PREFIX = re.compile(r"^(?:請問|請|幫我|麻煩|查詢|查一下|查|想問|我想知道|目前|現在)+")
+_SUFFIX = re.compile(r"(?:的|目前|現在|還|都|各|分別)+$")
+_SEPARATORS = re.compile(r"[、,;/和跟與及\s]+")
+
+
+@dataclass
+class Route:
+    intent: str  # order_lookup / price / stock / catalog
+    reply: str
+    summary: str | None = None  # 給 add_messages_window 收合長回覆用
+
+
+_stats_lock = threading.Lock()
+_stats: Counter = Counter()
+
+
+def _record(intent: str) -> None:
+    with _stats_lock:
+        _stats[intent] += 1
+
+
+def route_stats() -> dict[str, int]:
+    """Messages handled per intent since start-up ("fallback" = sent to the agent)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_route_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def _product_names(text: str) -> list[str] | None:
+    """Canonical product names mentioned in `text`, or None unless every
+    part resolves with high confidence. A part contained in several names
+    stands for all of them, up to ROUTER_MAX_PRODUCTS names in total."""
+    text = _SUFFIX.sub("", _PREFIX.sub("", text))
+    parts = [p for p in _SEPARATORS.split(text) if p]
+    if not parts or len(parts) > ROUTER_MAX_PRODUCTS:
+        return None
+    index = get_index()
+    names = []
+    for part in parts:
+        match = index.resolve(part)
+        if match.ambiguous and match.matches <= ROUTER_MAX_PRODUCTS:
+            found = match.suggestions
+        elif match.product_name is None or match.score < ROUTER_MIN_SCORE:
+            return None
+        else:
+            found = [match.product_name]
+        names += [name for name in found if name not in names]
+    return names if len(names) <= ROUTER_MAX_PRODUCTS else None
+
+
+def _cut_at(msg: str, words: tuple[str, ...]) -> str | None:
+    """Text before the first keyword, or None if no keyword occurs."""
+    positions = [msg.find(w) for w in words if w in msg]
+    return msg[:min(positions)] if positions else None
+
+
+def _route_order(msg: str) -> Route | None:
+    match = _ORDER_ID.search(msg)
+    if not match:
+        return None
+    order_id = int(match.group(1) or match.group(2))
+    if not 1 <= order_id < _MAX_ORDER_ID:
+        return None
+    # 封存資料只在客戶明確問舊訂單時才查
+    archived = any(w in msg for w in _ARCHIVE_WORDS)
+    result = query_orders.invoke({"order_id": order_id, "include_archived": archived})
+    if result.startswith("找不到"):
+        return Route("order_lookup", result)
+    return Route("order_lookup", f"以下是訂單 {order_id} 的資料：\n{result}")
+
+
+def _route_catalog(msg: str) -> Route | None:
+    rest = _CATALOG.sub("", msg)
+    # 「有哪些蘋果產品」這類帶條件的列表交給 agent
+    if not _CATALOG.search(msg) or len(_SUFFIX.sub("", _PREFIX.sub("", rest))) > 4:
+        return None
+    products = get_catalog().render_text(limit=CATALOG_CHAT_LIMIT)
+    return Route(
+        "catalog",
+        f"以下是我們的產品列表（也可到 http://localhost:8000/products 查看）：\n\n{products}",
+        summary="已列出產品列表（http://localhost:8000/products）。",
+    )
+
+
+def _route_product(msg: str) -> Route | None:
+    price_part = _cut_at(msg, _PRICE_WORDS)
+    stock_part = _cut_at(msg, _STOCK_WORDS)
+    if price_part is None and stock_part is None:
+        return None
+    if price_part is not None:
+        names = _product_names(price_part if stock_part is None else min(price_part, stock_part, key=len))
+        if not names:
+            return None
+        result = query_products.invoke({"product_names": names})
+        return Route("price", f"以下是{'、'.join(names)}的價格資訊：\n{result}")
+    names = _product_names(stock_part)
+    if not names:
+        return None
+    result = check_stock.invoke({"product_names": names})
+    return Route("stock", f"以下是{'、'.join(names)}的庫存狀況：\n{result}")
+
+
+def route_message(user_msg: str) -> Route | None:
+    """Answer common lookups without the LLM.
+
+    Recognises an order number lookup, price / stock questions about known
+    product names and "list all products". Returns None whenever the
+    message is ambiguous so the caller falls back to the ReAct agent.
+    """
+    if not INTENT_ROUTER_ENABLED:
+        return None
+    msg = unicodedata.normalize("NFKC", user_msg or "").strip().rstrip("?？。!！~ ")
+    route = None
+    if msg and len(msg) <= ROUTER_MAX_LENGTH and not any(w in msg for w in _ACTION_WORDS):
+        try:
+            route = _route_order(msg) or _route_catalog(msg) or _route_product(msg)
+        except Exception as e:
+            # 工具在 ToolNode 之外直接呼叫，出錯時交給 agent 處理，不讓整個 turn 失敗
+            logger.error(f"Intent router failed on {msg!r}: {e}", exc_info=True)
+            route = None
+    _record(route.intent if route else "fallback")
+    return route
@@ -1,14 +1,24 @@
-from fastapi import FastAPI, HTTPException
+import os
+import threading
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from contextlib import asynccontextmanager
+from fastapi.responses import FileResponse, JSONResponse
+from contextlib import asynccontextmanager, contextmanager
 from langchain_core.messages import HumanMessage
 
 from models import ChatRequest, ChatResponse
-from database import init_db, seed_sample_data, get_connection
+from database import init_db, seed_sample_data
 from agent import agent_executor
+from catalog import get_catalog
+from writer import close_writer
+from archive import ARCHIVED_TABLES
+from replica import admin_connection, close_replica
+from db_profile import profiled, stats as db_stats
 
 ALLOWED_TABLES = {"customer", "product", "orders", "customer_order_detail", "wastage"}
+# 封存資料可能很大：archived=true 一次最多回傳幾列（較新的在前），搜尋請用 order_id / customer_name 篩選
+ADMIN_ARCHIVE_LIMIT = int(os.getenv("ADMIN_ARCHIVE_LIMIT", "200"))
 
 
 @asynccontextmanager
@@ -16,21 +26,51 @@ async def lifespan(app: FastAPI):
     init_db()
     seed_sample_data()
     yield
+    close_writer()
+    close_replica()
 
 
 app = FastAPI(title="AI Customer Service Agent", lifespan=lifespan)
 
 
+# 同一個 session 的 turn 必須一個接一個（否則同一份預覽可能被「確認」兩次、checkpoint 互相覆蓋）
+_session_locks: dict[str, tuple[threading.Lock, int]] = {}
+_session_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _session_turn(session_id: str):
+    """Run one turn at a time per session; other sessions are not blocked."""
+    with _session_locks_guard:
+        lock, users = _session_locks.get(session_id, (None, 0))
+        lock = lock or threading.Lock()
+        _session_locks[session_id] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _session_locks_guard:
+            users = _session_locks[session_id][1] - 1
+            if users:
+                _session_locks[session_id] = (lock, users)
+            else:
+                del _session_locks[session_id]
+
+
+# 用 def：agent_executor.invoke 是同步呼叫（LLM、DB、等待 writer commit），放在 threadpool 執行，
+# 多個對話才能同時進行，writer 也才收得到可合併的並行寫入；同一 session 由 _session_turn 排隊
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@profiled("chat")
+def chat(request: ChatRequest):
     session_id = request.session_id or "default"
     config = {"configurable": {"thread_id": session_id}}
 
     try:
-        result = agent_executor.invoke(
-            {"messages": [HumanMessage(content=request.message)]},
-            config=config,
-        )
+        with _session_turn(session_id):
+            result = agent_executor.invoke(
+                {"messages": [HumanMessage(content=request.message)]},
+                config=config,
+            )
         ai_message = result["messages"][-1]
         return ChatResponse(reply=ai_message.content)
     except Exception as e:
@@ -38,45 +78,106 @@ async def chat(request: ChatRequest):
         return ChatResponse(reply=f"系統處理時發生錯誤，請再試一次。（錯誤：{type(e).__name__}）")
 
 
+# 管理後台端點讀取快照副本（replica.py），回應附上資料版本與落後秒數。
+# 用 def 而非 async def 並直接回傳 JSONResponse：查詢與 JSON 編碼都在 threadpool 執行，
+# 大量匯出不會卡住 /api/chat 的 event loop（回傳 dict 時 FastAPI 會在 event loop 上做 jsonable_encoder）
+
+
+def _versioned_response(body: dict, version: dict) -> JSONResponse:
+    headers = {"X-Data-Version": str(version["data_version"]), "X-Data-Staleness": str(version["staleness_s"])}
+    return JSONResponse({**body, **version}, headers=headers)
+
+
 @app.get("/api/admin/table/{table_name}")
-async def get_table(table_name: str):
+@profiled("admin_table")
+def get_table(table_name: str, archived: bool = False, order_id: int = 0, customer_name: str = "", limit: int = 0):
     if table_name not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
-    conn = get_connection()
-    rows = conn.execute(f"SELECT * FROM {table_name}").fetchall()
-    columns = [desc[0] for desc in conn.execute(f"SELECT * FROM {table_name} LIMIT 0").description] if rows else []
-    if not columns:
-        cursor = conn.execute(f"PRAGMA table_info({table_name})")
-        columns = [row[1] for row in cursor.fetchall()]
+    # archived=true：讀封存資料庫中的舊訂單（只有 orders / customer_order_detail 會被封存）
+    if archived and table_name not in ARCHIVED_TABLES:
+        raise HTTPException(status_code=400, detail="Table is not archived")
+    if archived:
+        limit = min(limit, ADMIN_ARCHIVE_LIMIT) if limit > 0 else ADMIN_ARCHIVE_LIMIT
+    conn, version = admin_connection(archived)
+    source = f"archive.{table_name}" if archived else table_name
+    columns = [row[1] for row in conn.execute(f"PRAGMA {'archive.' if archived else ''}table_info({table_name})")]
+    # 篩選在資料庫端做（order_id 走主鍵/索引），不必把整張表傳給瀏覽器再過濾
+    filters = [f for f in (
+        ("order_id", "order_id = ?", order_id),
+        ("customer_name", "instr(customer_name, ?) > 0", customer_name),
+    ) if f[2]]
+    if any(column not in columns for column, _, _ in filters):
+        conn.close()
+        raise HTTPException(status_code=400, detail="Filter not supported for this table")
+    query = f"SELECT * FROM {source}"
+    if filters:
+        query += " WHERE " + " AND ".join(sql for _, sql, _ in filters)
+    if limit > 0:
+        query += f" ORDER BY rowid DESC LIMIT {limit}"
+    rows = conn.execute(query, [value for _, _, value in filters]).fetchall()
     conn.close()
-    return {
+    return _versioned_response({
         "columns": columns,
         "rows": [dict(r) for r in rows],
-    }
+        "limit": limit or None,
+    }, version)
+
+
+# def：目錄版本變了（每次扣庫存都會）時 get_catalog() 會同步重建整份列表，不能放在 event loop 上
+@app.get("/api/products")
+def list_products(request: Request, page: int = 1, page_size: int = 0, supplier: str = "", q: str = ""):
+    catalog = get_catalog()
+    headers = {"X-Catalog-Version": str(catalog.version)}
+    if page_size > 0 or supplier or q:
+        return JSONResponse(catalog.page(page, page_size, supplier, q), headers=headers)
+
+    # 完整列表：每個版本只序列化/壓縮一次，並支援 ETag
+    headers["ETag"] = catalog.etag
+    # 同一個 URL 依 Accept-Encoding 回傳 gzip 或未壓縮版本，快取必須分開存
+    headers["Vary"] = "Accept-Encoding"
+    if request.headers.get("if-none-match") == catalog.etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(catalog.gzip_body, media_type="application/json", headers=headers)
+    return Response(catalog.json_body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/admin/order/{order_id}")
-async def get_order_detail(order_id: int):
-    conn = get_connection()
-    order = conn.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+@profiled("admin_order")
+def get_order_detail(order_id: int, archived: bool = False):
+    # 預設只查主資料庫；archived=true 時找不到再查封存資料庫
+    conn, version = admin_connection(archived)
+    schemas = ["main", "archive"] if archived else ["main"]
+    for schema in schemas:
+        order = conn.execute(f"SELECT * FROM {schema}.orders WHERE order_id = ?", (order_id,)).fetchone()
+        if order:
+            break
     if not order:
         conn.close()
         raise HTTPException(status_code=404, detail="Order not found")
 
     details = conn.execute(
-        """SELECT d.quantity, d.unit_price, p.product_name, p.unit,
+        f"""SELECT d.quantity, d.unit_price, p.product_name, p.unit,
                   (d.quantity * d.unit_price) as subtotal
-           FROM customer_order_detail d
-           JOIN product p ON d.product_id = p.product_id
+           FROM {schema}.customer_order_detail d
+           JOIN main.product p ON d.product_id = p.product_id
            WHERE d.order_id = ?""",
         (order_id,),
     ).fetchall()
     conn.close()
 
-    return {
+    return _versioned_response({
         "order": dict(order),
         "items": [dict(d) for d in details],
-    }
+        "archived": schema == "archive",
+    }, version)
+
+
+@app.get("/api/admin/db_stats")
+async def get_db_stats():
+    # DB_PROFILE=1 時的查詢統計：每種請求/turn 的平均查詢數與最近的慢查詢（含查詢計畫）
+    return db_stats()
 
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import threading
+import heapq
+import unicodedata
+from array import array
+from functools import lru_cache
+from dataclasses import dataclass, field
+
+from pypinyin import lazy_pinyin
+
+import database
+from database import get_connection
+
+# 常見別名 → 產品名稱。可用 PRODUCT_SYNONYMS_FILE 指向 JSON 檔覆寫/擴充
+DEFAULT_SYNONYMS = {
+    "鮮奶": "牛奶",
+    "鮮乳": "牛奶",
+    "牛乳": "牛奶",
+    "蛋": "雞蛋",
+    "雞卵": "雞蛋",
+    "米": "白米",
+    "白飯米": "白米",
+    "apple": "蘋果",
+    "banana": "香蕉",
+    "milk": "牛奶",
+    "egg": "雞蛋",
+    "eggs": "雞蛋",
+    "rice": "白米",
+}
+
+# 模糊比對分數門檻：高於 ACCEPT 且領先第二名 MARGIN 才直接採用，否則只給建議
+ACCEPT_SCORE = 0.6
+ACCEPT_MARGIN = 0.1
+SUGGEST_SCORE = 0.3
+# 完全相同、別名、唯一包含、同音的分數都 >= CONFIDENT_SCORE；寫入（下單、損耗）只接受這些，模糊比對只給建議
+CONFIDENT_SCORE = 0.9
+# 多項產品都包含查詢字串時不猜：分數壓在 ACCEPT_SCORE 以下，列出最多 AMBIGUOUS_LIMIT 個候選
+AMBIGUOUS_SCORE = 0.5
+AMBIGUOUS_LIMIT = 10
+
+_STRIP = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize(name: str) -> str:
+    """Width/case-folded name without whitespace or punctuation."""
+    return _STRIP.sub("", unicodedata.normalize("NFKC", name or "").lower())
+
+
+@lru_cache(maxsize=65536)
+def _char_sound(ch: str) -> str:
+    return lazy_pinyin(ch)[0]
+
+
+def phonetic(name: str) -> str:
+    """Toneless pinyin per character, so homophone typos (平果 / 蘋果) compare
+    equal. Looked up per character (cached) because whole-name conversion is
+    too slow for large catalogs."""
+    return " ".join(_char_sound(ch) for ch in name)
+
+
+def _grams(text: str) -> set[str]:
+    if len(text) <= 1:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _syllable_grams(sound: str) -> set[str]:
+    syllables = sound.split()
+    if len(syllables) <= 1:
+        return {f"#{s}" for s in syllables}
+    return {f"#{a} {b}" for a, b in zip(syllables, syllables[1:])}
+
+
+def load_synonyms() -> dict[str, str]:
+    synonyms = dict(DEFAULT_SYNONYMS)
+    path = os.getenv("PRODUCT_SYNONYMS_FILE")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            synonyms.update(json.load(f))
+    return {normalize(k): v for k, v in synonyms.items()}
+
+
+@dataclass
+class Match:
+    product_id: int | None
+    product_name: str | None
+    score: float
+    suggestions: list[str] = field(default_factory=list)
+    # 包含查詢字串的產品數（> 1 代表名稱不明確，suggestions 為這些產品）
+    matches: int = 0
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.matches > 1
+
+    def at_least(self, min_score: float) -> "Match":
+        """This match, or (below min_score) no product with the guess as a suggestion."""
+        if self.product_name is None or self.score >= min_score:
+            return self
+        return Match(None, None, self.score, [self.product_name, *self.suggestions])
+
+
+class ProductIndex:
+    """In-memory name index over the product table.
+
+    Names are indexed by character bigrams of the normalized name and by
+    pinyin syllable bigrams ("#ping guo"). Posting lists are int arrays of
+    row positions.
+    """
+
+    # Postings scanned to generate candidates, and candidates rescored exactly
+    CANDIDATE_BUDGET = 8000
+    SHORTLIST = 200
+
+    def __init__(self, rows, synonyms: dict[str, str] | None = None, version: int = 0):
+        self.version = version
+        self.synonyms = synonyms if synonyms is not None else load_synonyms()
+        self.ids = array("q")
+        self.names: list[str] = []
+        self.norms: list[str] = []
+        self.by_norm: dict[str, int] = {}
+        self.by_sound: dict[str, int] = {}
+        self.sounds: list[str] = []
+        self.gram_counts = array("H")
+        postings: dict[str, list[int]] = {}
+        for pos, (product_id, name) in enumerate(rows):
+            norm = normalize(name)
+            self.ids.append(product_id)
+            self.names.append(name)
+            self.norms.append(norm)
+            self.by_norm.setdefault(norm, pos)
+            sound = phonetic(norm)
+            self.by_sound.setdefault(sound, pos)
+            self.sounds.append(f" {sound} ")
+            grams = _grams(norm) | _syllable_grams(sound)
+            self.gram_counts.append(min(len(grams), 65535))
+            for g in grams:
+                postings.setdefault(g, []).append(pos)
+        self.postings = {g: array("i", p) for g, p in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _hit(self, pos: int, score: float) -> Match:
+        return Match(self.ids[pos], self.names[pos], score)
+
+    def _has(self, pos: int, gram: str) -> bool:
+        if gram.startswith("#"):
+            return f" {gram[1:]} " in self.sounds[pos]
+        return gram in self.norms[pos]
+
+    def candidates(self, query: str, limit: int = 5) -> list[tuple[float, int]]:
+        """(dice score, row position) of the best fuzzy candidates.
+
+        Candidates come from the rarest grams (up to CANDIDATE_BUDGET
+        postings); the SHORTLIST with most shared grams is then scored
+        exactly against every query gram.
+        """
+        norm = normalize(query)
+        grams = _grams(norm) | _syllable_grams(phonetic(norm))
+        present = sorted((g for g in grams if g in self.postings), key=lambda g: len(self.postings[g]))
+        if not present:
+            return []
+
+        hits: dict[int, int] = {}
+        scanned = 0
+        for g in present:
+            plist = self.postings[g]
+            if hits and scanned + len(plist) > self.CANDIDATE_BUDGET:
+                break
+            scanned += len(plist)
+            for pos in plist:
+                hits[pos] = hits.get(pos, 0) + 1
+
+        qn = len(grams)
+        shortlist = heapq.nlargest(self.SHORTLIST, hits, key=hits.__getitem__)
+        scored = []
+        for pos in shortlist:
+            shared = sum(1 for g in present if self._has(pos, g))
+            scored.append((2 * shared / (qn + self.gram_counts[pos]), pos))
+        scored.sort(key=lambda x: (-x[0], self.ids[x[1]]))
+        return [(min(score, 1.0), pos) for score, pos in scored[:limit]]
+
+    def containing(self, norm: str) -> list[int]:
+        """Positions of every name containing `norm`, shortest name first.
+
+        Such a name has all of the query's bigrams, so scanning the rarest
+        one's postings finds them all; a single character scans every name.
+        """
+        if len(norm) == 1:
+            pool = range(len(self.norms))
+        else:
+            plists = [self.postings.get(g) for g in _grams(norm)]
+            if not all(plists):
+                return []
+            pool = min(plists, key=len)
+        found = [pos for pos in pool if norm in self.norms[pos]]
+        found.sort(key=lambda pos: (len(self.norms[pos]), self.ids[pos]))
+        return found
+
+    def resolve(self, query: str) -> Match:
+        """Best product for a user-typed name, or suggestions when unsure.
+
+        Order: exact name, synonym, substring (like the old LIKE lookup),
+        same pronunciation, then fuzzy n-gram / pinyin score. A substring
+        contained in several names is ambiguous: no product, score
+        AMBIGUOUS_SCORE, and the containing names (shortest first) as
+        suggestions.
+        """
+        norm = normalize(query)
+        if not norm:
+            return Match(None, None, 0.0)
+
+        if norm in self.by_norm:
+            return self._hit(self.by_norm[norm], 1.0)
+
+        target = self.synonyms.get(norm)
+        if target is not None:
+            target_norm = normalize(target)
+            if target_norm in self.by_norm:
+                return self._hit(self.by_norm[target_norm], 1.0)
+            norm = target_norm
+
+        contains = self.containing(norm)
+        if len(contains) == 1:
+            return self._hit(contains[0], 0.95)
+        if contains:
+            return Match(None, None, AMBIGUOUS_SCORE,
+                         [self.names[p] for p in contains[:AMBIGUOUS_LIMIT]], matches=len(contains))
+
+        sound = phonetic(norm)
+        if sound in self.by_sound:
+            return self._hit(self.by_sound[sound], 0.9)
+
+        ranked = self.candidates(norm, limit=20)
+        if ranked:
+            best, pos = ranked[0]
+            runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+            if best >= ACCEPT_SCORE and best - runner_up >= ACCEPT_MARGIN:
+                return self._hit(pos, best)
+        suggestions = [self.names[p] for s, p in ranked[:3] if s >= SUGGEST_SCORE]
+        return Match(None, None, ranked[0][0] if ranked else 0.0, suggestions)
+
+
+_lock = threading.Lock()
+_current: tuple[str, int, ProductIndex] | None = None
+
+
+def names_version(conn) -> int:
+    row = conn.execute("SELECT names_version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def get_index(conn=None) -> ProductIndex:
+    """Current ProductIndex; rebuilt only when product names change
+    (names_version, bumped by triggers in database.init_db), not on stock updates."""
+    global _current
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        version = names_version(conn)
+        key = (database.DB_PATH, version)
+        cached = _current
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        with _lock:
+            if _current is not None and _current[:2] == key:
+                return _current[2]
+            rows = conn.execute("SELECT product_id, product_name FROM product ORDER BY product_id").fetchall()
+            index = ProductIndex([(r[0], r[1]) for r in rows], version=version)
+            _current = (*key, index)
+            return index
+    finally:
+        if own:
+            conn.close()
+
+
+def not_found_message(name: str, match: Match) -> str:
+    if match.ambiguous:
+        more = "等" if match.matches > len(match.suggestions) else ""
+        return f"「{name}」符合 {match.matches} 項產品：{'、'.join(match.suggestions)}{more}，請指定完整的產品名稱。"
+    msg = f"找不到產品「{name}」。"
+    if match.suggestions:
+        msg += f"您是不是要找：{'、'.join(match.suggestions)}？"
+    return msg
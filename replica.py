@@ -0,0 +1,211 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+import database
+import db_profile
+from database import get_connection
+from archive import attach_archive, get_archive_connection
+
+logger = logging.getLogger(__name__)
+
+# 管理後台的讀取改走快照副本（選用，預設關閉）：WAL 模式下直接讀主資料庫不會擋住寫入，
+# bench_replica 也量不出副本的好處，而副本過期時要在請求中複製整個資料庫
+ADMIN_READ_REPLICA = os.getenv("ADMIN_READ_REPLICA", "0") == "1"
+# 快照最多落後主資料庫幾秒；只在管理端點讀取且快照過期時才更新（不在背景定期複製）
+REPLICA_MAX_STALENESS = float(os.getenv("REPLICA_MAX_STALENESS", "10"))
+# 分段複製：每步 REPLICA_BACKUP_PAGES 頁，每一步都是短的讀取 transaction，步與步之間 WAL checkpoint 可以完成；
+# REPLICA_BACKUP_SLEEP_MS 可在步與步之間多讓出時間（但複製越久越容易因新的 commit 重來）
+REPLICA_BACKUP_PAGES = int(os.getenv("REPLICA_BACKUP_PAGES", "1024"))
+REPLICA_BACKUP_SLEEP_MS = float(os.getenv("REPLICA_BACKUP_SLEEP_MS", "0"))
+# 複製途中主資料庫有 commit 時 SQLite 會從頭重來；重來超過這個次數就改成一次複製完
+REPLICA_BACKUP_MAX_RESTARTS = int(os.getenv("REPLICA_BACKUP_MAX_RESTARTS", "3"))
+
+
+class Snapshot:
+    """One read-only copy of the main database taken with the online backup API."""
+
+    def __init__(self, path: str, version: int, taken_at: float, source_version: int):
+        self.path = path
+        self.version = version
+        self.taken_at = taken_at  # 快照與主資料庫確認一致的最後時間
+        self.source_version = source_version
+
+    @property
+    def staleness(self) -> float:
+        return time.time() - self.taken_at
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                               factory=db_profile.connection_factory())
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def info(self) -> dict:
+        return {
+            "data_version": self.version,
+            "snapshot_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.taken_at)),
+            "staleness_s": round(self.staleness, 3),
+        }
+
+
+class _Restarted(Exception):
+    pass
+
+
+class SnapshotReplica:
+    """On-demand snapshot of database.DB_PATH.
+
+    A request that finds the snapshot older than max_staleness refreshes
+    it: if PRAGMA data_version shows no commit since the last copy, the
+    snapshot is only marked current; otherwise Connection.backup() copies
+    the main database into a new file in steps of REPLICA_BACKUP_PAGES,
+    each its own short read, so checkpoints are not held back for the
+    whole copy. A copy restarted more than REPLICA_BACKUP_MAX_RESTARTS
+    times by concurrent commits is redone in one step. The new file is
+    swapped in; connections still reading the previous one keep it until
+    they close, and it is removed on the next refresh.
+    """
+
+    def __init__(self, db_path: str, max_staleness: float | None = None):
+        self.db_path = db_path
+        self.max_staleness = REPLICA_MAX_STALENESS if max_staleness is None else max_staleness
+        self.refreshes = 0
+        self.restarts = 0
+        self.single_step = 0
+        self._version = 0
+        self._current: Snapshot | None = None
+        self._previous: Snapshot | None = None
+        self._monitor: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _snapshot_path(self, version: int) -> str:
+        return f"{os.path.splitext(self.db_path)[0]}_replica_{os.getpid()}_{version}.db"
+
+    def refresh(self, max_age: float | None = None) -> Snapshot:
+        """Take a new snapshot (or, with max_age, only if the current one is older)."""
+        with self._lock:
+            current = self._current
+            if max_age is not None and current is not None and current.staleness <= max_age:
+                return current
+            if self._monitor is None:
+                self._monitor = sqlite3.connect(self.db_path, check_same_thread=False)
+            # data_version 只在其他連線 commit 後改變，沒變就不必重新複製
+            source_version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+            taken_at = time.time()
+            if current is not None and current.source_version == source_version:
+                current.taken_at = taken_at
+                return current
+            version = self._version + 1
+            path = self._snapshot_path(version)
+            self._copy(path)
+            stale, self._previous = self._previous, current
+            self._current = Snapshot(path, version, taken_at, source_version)
+            self._version = version
+            self.refreshes += 1
+        if stale is not None:
+            _remove(stale.path)
+        return self._current
+
+    def _copy(self, path: str) -> None:
+        source = get_connection()
+        target = sqlite3.connect(path)
+        remaining = [None]
+        restarts = [0]
+
+        def progress(status, left, total):
+            # 剩餘頁數變多代表 SQLite 因為來源有新的 commit 而從頭複製
+            if remaining[0] is not None and left > remaining[0]:
+                restarts[0] += 1
+                if restarts[0] > REPLICA_BACKUP_MAX_RESTARTS:
+                    raise _Restarted()
+            remaining[0] = left
+            # backup() 只在 SQLITE_BUSY 時才用 sleep 參數，步與步之間的休息在這裡做
+            if left and REPLICA_BACKUP_SLEEP_MS > 0:
+                time.sleep(REPLICA_BACKUP_SLEEP_MS / 1000)
+
+        try:
+            try:
+                source.backup(target, pages=REPLICA_BACKUP_PAGES, progress=progress)
+            except _Restarted:
+                # 寫入太頻繁，分段複製追不上：改成一次複製完（單一一致的讀取快照）
+                source.backup(target)
+                self.single_step += 1
+            # 副本只會被唯讀開啟，不需要 WAL 的 -wal / -shm 檔
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            self.restarts += restarts[0]
+            target.close()
+            source.close()
+
+    def snapshot(self) -> Snapshot:
+        """Current snapshot; refreshed synchronously if it is older than max_staleness."""
+        current = self._current
+        if current is None or current.staleness > self.max_staleness:
+            current = self.refresh(max_age=self.max_staleness)
+        return current
+
+    def close(self) -> None:
+        for snapshot in (self._previous, self._current):
+            if snapshot is not None:
+                _remove(snapshot.path)
+        self._previous = self._current = None
+        if self._monitor is not None:
+            self._monitor.close()
+            self._monitor = None
+
+
+def _remove(path: str) -> None:
+    for p in (path, f"{path}-journal", f"{path}-wal", f"{path}-shm"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove old replica {p}: {e}")
+
+
+_lock = threading.Lock()
+_replica: SnapshotReplica | None = None
+
+
+def get_replica() -> SnapshotReplica:
+    """Process-wide replica for the current database.DB_PATH."""
+    global _replica
+    replica = _replica
+    if replica is not None and replica.db_path == database.DB_PATH:
+        return replica
+    with _lock:
+        if _replica is None or _replica.db_path != database.DB_PATH:
+            if _replica is not None:
+                _replica.close()
+            _replica = SnapshotReplica(database.DB_PATH)
+        return _replica
+
+
+def close_replica() -> None:
+    global _replica
+    with _lock:
+        if _replica is not None:
+            _replica.close()
+            _replica = None
+
+
+def admin_connection(archived: bool = False) -> tuple[sqlite3.Connection, dict]:
+    """Read connection for the admin endpoints and the data version it sees.
+
+    With ADMIN_READ_REPLICA=1 this is the snapshot replica; by default
+    the live database. archived=True also attaches the archive
+    database (see archive.py) as schema `archive`.
+    """
+    if not ADMIN_READ_REPLICA:
+        conn = get_archive_connection() if archived else get_connection()
+        return conn, {"data_version": "live", "staleness_s": 0.0}
+    snapshot = get_replica().snapshot()
+    conn = snapshot.connect()
+    if archived:
+        # 封存資料庫只由 archive.py 寫入，直接唯讀連接即可
+        attach_archive(conn, uri=True)
+    return conn, snapshot.info()
@@ -6,7 +6,8 @@ lsof -i :8000 -t 2>/dev/null | xargs kill 2>/dev/null
 sleep 1
 
 echo "Deleting product.db..."
-rm -f product.db
+rm -f product.db product_archive.db product_replica_*.db
+rm -rf profiles
 
 echo "Starting server..."
 /opt/homebrew/anaconda3/envs/poc/bin/uvicorn main:app --port 8000 --reload
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import time
+import random
+import logging
+import argparse
+import calendar
+import itertools
+
+import database
+from database import get_connection, init_db, seed_sample_data
+
+logger = logging.getLogger(__name__)
+
+# 產生大量測試資料：在 seed_sample_data 的 3 位客戶 / 5 項產品之後追加，schema 沿用 init_db
+# 同一組參數 + --seed + --until 產生的資料完全相同
+
+CHUNK_ORDERS = 50_000
+
+# 載入期間先移除、最後由 init_db() 重建的索引與 trigger（每列都維護索引 / 觸發 trigger 會拖慢大量寫入）
+DEFERRED_INDEXES = ["idx_detail_order", "idx_customer_name", "idx_customer_phone"]
+DEFERRED_TRIGGERS = [f"product_catalog_{e}" for e in ("insert", "update", "delete")] + \
+                    [f"product_names_{e}" for e in ("insert", "update", "delete")]
+
+# ============ 名稱素材 ============
+
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝洪郭邱曾廖賴徐周葉蘇莊呂江何蕭羅高潘簡朱鍾彭游詹胡施沈余盧梁趙顏柯翁魏孫戴"
+GIVEN_CHARS = "志明俊傑建宏家豪冠宇承恩宗翰柏翰宥廷彥廷雅婷怡君淑芬美玲佳穎欣怡詩涵心怡宜蓁品妍子晴文華玉珍秀英麗華淑惠國強信宏"
+SHOP_WORDS = ["小吃店", "餐廳", "早餐店", "麵館", "便當店", "自助餐", "火鍋店", "超市", "商行", "果汁吧", "烘焙坊", "咖啡館"]
+SHOP_PREFIXES = ["阿", "老", "好", "大", "小", "金", "福", "旺", "興", "順"]
+
+CITIES = {
+    "台北市": ["信義區", "大安區", "中山區", "內湖區", "士林區", "松山區"],
+    "新北市": ["板橋區", "新莊區", "中和區", "三重區", "新店區", "淡水區"],
+    "桃園市": ["桃園區", "中壢區", "八德區", "龜山區"],
+    "台中市": ["西屯區", "北屯區", "南屯區", "豐原區", "大里區"],
+    "台南市": ["東區", "永康區", "安平區", "北區"],
+    "高雄市": ["前鎮區", "三民區", "苓雅區", "左營區", "鳳山區"],
+}
+ROADS = ["中山路", "中正路", "民生路", "民權路", "復興路", "和平路", "光復路", "建國路", "忠孝路", "仁愛路",
+         "信義路", "自強路", "成功路", "文化路", "公園路"]
+
+ORIGINS = ["台灣", "日本", "紐西蘭", "美國", "澳洲", "韓國", "智利", "泰國",
+           "屏東", "嘉義", "宜蘭", "台東", "花蓮", "雲林", "南投", "彰化"]
+QUALIFIERS = ["特級", "精選", "有機", "產地直送", "小農", "冷藏", "家庭號", "大顆"]
+
+# 類別：(品項, 單位, 價格範圍, 供應商, 規格)
+CATEGORIES = [
+    (["蘋果", "香蕉", "芭樂", "鳳梨", "芒果", "葡萄", "奇異果", "草莓", "西瓜", "木瓜", "柳橙", "橘子",
+      "水梨", "荔枝", "龍眼", "蓮霧", "櫻桃", "藍莓", "火龍果", "百香果"],
+     "箱", (250, 1500), ["台灣水果商", "果菜批發市場", "進口水果商"], ["每箱10斤", "每箱15斤", "每箱20斤"]),
+    (["高麗菜", "青江菜", "菠菜", "空心菜", "地瓜葉", "花椰菜", "番茄", "小黃瓜", "紅蘿蔔", "洋蔥",
+      "馬鈴薯", "玉米", "茄子", "南瓜", "青椒", "香菇", "杏鮑菇", "金針菇", "豆芽菜", "蘆筍"],
+     "斤", (25, 180), ["果菜批發市場", "契作農場"], ["散裝", "每袋1斤", "每袋3斤"]),
+    (["牛奶", "鮮乳", "優格", "起司", "奶油", "豆漿"],
+     "瓶", (35, 320), ["鮮奶供應商", "乳品公司"], ["200ml", "936ml", "1000ml", "2000ml"]),
+    (["雞蛋", "鴨蛋", "鹹蛋", "皮蛋"],
+     "盒", (45, 220), ["養雞場", "蛋品行"], ["每盒10顆", "每盒20顆", "每盒30顆"]),
+    (["白米", "糙米", "糯米", "燕麥", "麵粉", "米粉", "麵條", "冬粉"],
+     "包", (60, 650), ["米商", "糧行"], ["每包1公斤", "每包3公斤", "每包5公斤"]),
+    (["豬肉片", "雞胸肉", "雞腿", "牛肉片", "絞肉", "排骨"],
+     "公斤", (180, 900), ["肉品公司", "冷凍食品行"], ["冷藏", "冷凍", "真空包裝"]),
+    (["鮭魚", "白蝦", "蛤蜊", "鯛魚片", "花枝", "虱目魚"],
+     "公斤", (200, 1200), ["漁產行", "冷凍食品行"], ["冷凍", "真空包裝", "去刺"]),
+    (["醬油", "米酒", "麻油", "沙拉油", "砂糖", "烏醋", "味醂", "綠茶", "紅茶", "咖啡豆"],
+     "罐", (40, 600), ["雜貨批發", "食品公司"], ["500ml", "1公升", "每包1公斤"]),
+]
+
+DELIVERY_METHODS = ["專車", "郵寄"]
+PAYMENT_METHODS = ["現金", "匯款", "貨到付款"]
+
+
+# ============ 產生資料列 ============
+
+def _person_name(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + rng.choice(GIVEN_CHARS) + rng.choice(GIVEN_CHARS)
+
+
+def _shop_name(rng: random.Random) -> str:
+    return rng.choice(SHOP_PREFIXES) + rng.choice(SURNAMES) + rng.choice(SHOP_WORDS)
+
+
+def _address(rng: random.Random) -> str:
+    city = rng.choice(list(CITIES))
+    return f"{city}{rng.choice(CITIES[city])}{rng.choice(ROADS)}{rng.randint(1, 6)}段{rng.randint(1, 300)}號"
+
+
+def customer_rows(rng: random.Random, count: int, taken: set[str]):
+    """(name, address, phone); names are unique (idx_customer_name), phones distinct."""
+    # stride 與 10^8 互質，電話號碼不重複又不會看起來是連號
+    phone_base, phone_stride = rng.randrange(10 ** 8), 37_139_213
+    for i in range(count):
+        name = _shop_name(rng) if rng.random() < 0.3 else _person_name(rng)
+        if name in taken:
+            name = next(f"{name}{n}" for n in itertools.count(2) if f"{name}{n}" not in taken)
+        taken.add(name)
+        yield name, _address(rng), f"09{(phone_base + i * phone_stride) % 10 ** 8:08d}"
+
+
+def product_rows(rng: random.Random, count: int, taken: set[str]):
+    """(name, unit, price, stock, safety_stock, supplier, specification) with unique names."""
+    combos = [
+        (origin + qualifier + item, category)
+        for category in CATEGORIES
+        for item in category[0]
+        for origin in [""] + ORIGINS
+        for qualifier in [""] + QUALIFIERS
+        if origin or qualifier
+    ]
+    rng.shuffle(combos)
+    for i in range(count):
+        name, (_, unit, (low, high), suppliers, specs) = combos[i % len(combos)]
+        if i >= len(combos):
+            name = f"{name}{i // len(combos) + 1}號"
+        if name in taken:
+            continue
+        taken.add(name)
+        stock = rng.randint(50, 2000)
+        yield (name, unit, rng.randrange(low, high, 5), stock, stock // rng.randint(5, 10),
+               rng.choice(suppliers), rng.choice(specs))
+
+
+def _timestamp(ts: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+
+
+# ============ 產生資料庫 ============
+
+def generate_scale_data(
+    customers: int = 10_000,
+    products: int = 1_000,
+    orders: int = 100_000,
+    lines: int = 3,
+    wastage: int = 5_000,
+    days: int = 365,
+    until: str = "",
+    seed: int = 0,
+) -> dict:
+    """Append synthetic customers, products, orders, detail lines and
+    wastage to database.DB_PATH.
+
+    Orders are spread evenly over the `days` days before `until` (UTC
+    date, default today). Each order has 1 to 2*lines-1 distinct products.
+    Popular customers and products appear far more often than the rest.
+    Orders older than three days are mostly delivered. Secondary indexes
+    and the product triggers are dropped during the load and recreated by
+    init_db(), and catalog_version is bumped once at the end.
+    """
+    rng = random.Random(seed)
+    init_db()
+    seed_sample_data()
+    end = calendar.timegm(time.strptime(until, "%Y-%m-%d")) if until else calendar.timegm(time.gmtime()[:3] + (0, 0, 0, 0, 0, 0))
+    start_ts = end - days * 86400
+    stats = {"customers": 0, "products": 0, "orders": 0, "details": 0, "wastage": 0}
+
+    conn = get_connection()
+    conn.isolation_level = None
+    # 一次性的大量載入：journal 放記憶體、不 fsync，失敗時重新產生即可
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    try:
+        conn.execute("BEGIN")
+        for name in DEFERRED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for name in DEFERRED_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+        taken = {r[0] for r in conn.execute("SELECT customer_name FROM customer")}
+        conn.executemany(
+            "INSERT INTO customer (customer_name, customer_address, customer_phone) VALUES (?, ?, ?)",
+            customer_rows(rng, customers, taken),
+        )
+        taken = {r[0] for r in conn.execute("SELECT product_name FROM product")}
+        conn.executemany(
+            "INSERT INTO product (product_name, unit, price, stock, safety_stock, supplier, specification) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            product_rows(rng, products, taken),
+        )
+        customer_list = conn.execute("SELECT customer_id, customer_name FROM customer ORDER BY customer_id").fetchall()
+        rng.shuffle(customer_list)
+        product_list = conn.execute("SELECT product_id, product_name, price FROM product ORDER BY product_id").fetchall()
+        stats["customers"] = len(customer_list)
+        stats["products"] = len(product_list)
+
+        # 熱門程度約略呈 Zipf 分布：少數產品佔大部分明細；客戶則以 random()**2 偏向前面（已打亂）的常客
+        product_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(product_list))))
+        product_order = list(range(len(product_list)))
+        rng.shuffle(product_order)
+        product_ids = [product_list[i][0] for i in product_order]
+        product_prices = [product_list[i][2] for i in product_order]
+        product_names = [product_list[i][1] for i in product_order]
+
+        next_order = (conn.execute("SELECT MAX(order_id) FROM orders").fetchone()[0] or 0) + 1
+        step = days * 86400 / max(orders, 1)
+        recent = end - 3 * 86400
+        max_lines = max(1, 2 * lines - 1)
+        random_ = rng.random  # 熱迴圈只用 random()：randint / choice 慢好幾倍
+        for chunk_start in range(0, orders, CHUNK_ORDERS):
+            chunk = min(CHUNK_ORDERS, orders - chunk_start)
+            picks = iter(rng.choices(range(len(product_ids)), cum_weights=product_weights, k=chunk * max_lines))
+            order_rows, detail_rows = [], []
+            for i in range(chunk_start, chunk_start + chunk):
+                order_id = next_order + i
+                customer_id, customer_name = customer_list[int(len(customer_list) * random_() ** 2)]
+                total = 0
+                for p in dict.fromkeys(next(picks) for _ in range(1 + int(random_() * max_lines))):
+                    quantity = 1 + int(random_() * 10)
+                    total += quantity * product_prices[p]
+                    detail_rows.append((customer_id, product_ids[p], order_id, quantity, product_prices[p]))
+                created = start_ts + (i + random_()) * step
+                order_rows.append((
+                    order_id, customer_name,
+                    DELIVERY_METHODS[int(random_() * len(DELIVERY_METHODS))],
+                    PAYMENT_METHODS[int(random_() * len(PAYMENT_METHODS))],
+                    total, int(created < recent and random_() < 0.99), _timestamp(created),
+                ))
+            conn.executemany(
+                """INSERT INTO orders (order_id, customer_name, delivery_method, payment_method, total_price, is_delivered, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                order_rows,
+            )
+            conn.executemany(
+                "INSERT INTO customer_order_detail (customer_id, product_id, order_id, quantity, unit_price) VALUES (?, ?, ?, ?, ?)",
+                detail_rows,
+            )
+            stats["orders"] += len(order_rows)
+            stats["details"] += len(detail_rows)
+
+        wastage_picks = rng.choices(range(len(product_ids)), cum_weights=product_weights, k=wastage)
+        conn.executemany(
+            "INSERT INTO wastage (product_name, product_id, loss_quantity) VALUES (?, ?, ?)",
+            ((product_names[p], product_ids[p], rng.randint(1, 5)) for p in wastage_picks),
+        )
+        stats["wastage"] = wastage
+        # trigger 已移除，手動讓產品目錄與名稱索引的快取失效
+        conn.execute("UPDATE catalog_version SET version = version + 1, names_version = names_version + 1 WHERE id = 1")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+    # 重建索引與 trigger、更新查詢規劃器統計
+    init_db()
+    conn = get_connection()
+    conn.execute("ANALYZE")
+    conn.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic data for scale testing")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (created if missing)")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--lines", type=int, default=3, help="mean detail lines per order")
+    parser.add_argument("--wastage", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=365, help="spread orders over this many days")
+    parser.add_argument("--until", default="", help="date of the newest orders, YYYY-MM-DD (default today, UTC)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="delete the database file first")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    database.DB_PATH = os.path.abspath(args.db)
+    if args.reset and os.path.exists(database.DB_PATH):
+        os.remove(database.DB_PATH)
+    started = time.perf_counter()
+    result = generate_scale_data(args.customers, args.products, args.orders, args.lines,
+                                 args.wastage, args.days, args.until, args.seed)
+    print(f"已產生 {result['customers']} 位客戶、{result['products']} 項產品、{result['orders']} 筆訂單、"
+          f"{result['details']} 筆明細、{result['wastage']} 筆損耗（{database.DB_PATH}，{time.perf_counter() - started:.1f} 秒）")
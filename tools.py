@@ -1,5 +1,93 @@
 from langchain_core.tools import tool
 from database import get_connection
+from catalog import format_product_line, get_catalog
+from product_search import CONFIDENT_SCORE, get_index, not_found_message
+from writer import run_write
+from archive import get_archive_connection
+from customers import normalize_phone
+
+
+# ============ 共用查詢 ============
+
+def _collect_names(product_name: str = "", product_names: list[str] | None = None) -> list[str]:
+    """Merge the single-name and list arguments into one de-duplicated list."""
+    names = []
+    for name in [product_name, *(product_names or [])]:
+        name = (name or "").strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _fetch_products_like(conn, names: list[str]) -> list:
+    """One round-trip for several names: product_name LIKE '%a%' OR LIKE '%b%' ..."""
+    where = " OR ".join(["product_name LIKE ?"] * len(names))
+    return conn.execute(
+        f"SELECT * FROM product WHERE {where} ORDER BY product_id",
+        [f"%{name}%" for name in names],
+    ).fetchall()
+
+
+def _match_products(names: list[str], conn=None, min_score: float = 0.0) -> dict:
+    """{name: Match} from the fuzzy name index; matches below min_score become
+    suggestions. Writers call this before run_write so an index rebuild
+    never runs inside the write transaction."""
+    index = get_index(conn)
+    return {name: index.resolve(name).at_least(min_score) for name in names}
+
+
+def _resolve_products(conn, names: list[str], columns: str = "*", matches: dict | None = None,
+                      min_score: float = 0.0) -> dict:
+    """Resolve user-typed names through the fuzzy name index (unless already
+    matched), then fetch all resolved rows in one query.
+    Returns {name: (row or None, Match)}."""
+    if matches is None:
+        matches = _match_products(names, conn, min_score)
+    ids = sorted({m.product_id for m in matches.values() if m.product_id is not None})
+    rows = {}
+    if ids:
+        placeholders = ", ".join(["?"] * len(ids))
+        for r in conn.execute(
+            f"SELECT product_id AS _pid, {columns} FROM product WHERE product_id IN ({placeholders})", ids
+        ).fetchall():
+            rows[r["_pid"]] = r
+    return {name: (rows.get(m.product_id), m) for name, m in matches.items()}
+
+
+def _rows_for_name(rows: list, name: str) -> list:
+    """Rows matching one name, mirroring SQLite's case-insensitive LIKE."""
+    needle = name.lower()
+    return [r for r in rows if needle in r["product_name"].lower()]
+
+
+def _format_stock(row) -> str:
+    status = "正常"
+    if row["stock"] <= row["safety_stock"]:
+        status = "⚠️ 低於安全庫存，需要補貨！"
+
+    return (
+        f"產品: {row['product_name']}\n"
+        f"目前庫存: {row['stock']}{row['unit']}\n"
+        f"安全庫存: {row['safety_stock']}{row['unit']}\n"
+        f"庫存狀態: {status}"
+    )
+
+
+def _find_order(conn, order_id: int, schema: str = "main"):
+    """(order, detail rows) from the hot tables (main) or the archive."""
+    order = conn.execute(
+        f"SELECT * FROM {schema}.orders WHERE order_id = ?", (order_id,)
+    ).fetchone()
+    if not order:
+        return None, []
+    details = conn.execute(
+        f"""SELECT d.quantity, d.unit_price, p.product_name, p.unit
+            FROM {schema}.customer_order_detail d
+            JOIN main.product p ON d.product_id = p.product_id
+            WHERE d.order_id = ?""",
+        (order_id,),
+    ).fetchall()
+    return order, details
 
 
 # ============ Function Call 1: 建立客戶資料 ============
@@ -9,44 +97,41 @@ def register_customer(customer_name: str, customer_address: str, customer_phone:
     """【下單步驟一】建立或更新客戶基本資料，存入資料庫。
     需要提供：客戶名稱、地址、電話。
     Register or update customer info and save to database."""
-    conn = get_connection()
-    try:
-        existing = conn.execute(
-            "SELECT * FROM customer WHERE customer_name = ?",
-            (customer_name,),
+    # 電話去掉連字號/空白再存，老客戶辨識（extract_phone）才比對得到
+    customer_phone = normalize_phone(customer_phone)
+
+    def write(conn):
+        # 名稱有唯一索引：新客戶直接 INSERT，已存在則 UPDATE，不需先 SELECT
+        row = conn.execute(
+            """INSERT INTO customer (customer_name, customer_address, customer_phone) VALUES (?, ?, ?)
+               ON CONFLICT(customer_name) DO NOTHING RETURNING customer_id""",
+            (customer_name, customer_address, customer_phone),
         ).fetchone()
-
-        if existing:
-            conn.execute(
-                "UPDATE customer SET customer_address = ?, customer_phone = ? WHERE customer_id = ?",
-                (customer_address, customer_phone, existing["customer_id"]),
-            )
-            conn.commit()
+        if row:
             return (
-                f"客戶資料已更新！\n"
-                f"客戶ID: {existing['customer_id']}\n"
+                f"客戶資料建立成功！\n"
+                f"客戶ID: {row['customer_id']}\n"
                 f"名稱: {customer_name}\n"
                 f"地址: {customer_address}\n"
                 f"電話: {customer_phone}"
             )
 
-        cursor = conn.execute(
-            "INSERT INTO customer (customer_name, customer_address, customer_phone) VALUES (?, ?, ?)",
-            (customer_name, customer_address, customer_phone),
-        )
-        conn.commit()
+        row = conn.execute(
+            "UPDATE customer SET customer_address = ?, customer_phone = ? WHERE customer_name = ? RETURNING customer_id",
+            (customer_address, customer_phone, customer_name),
+        ).fetchone()
         return (
-            f"客戶資料建立成功！\n"
-            f"客戶ID: {cursor.lastrowid}\n"
+            f"客戶資料已更新！\n"
+            f"客戶ID: {row['customer_id']}\n"
             f"名稱: {customer_name}\n"
             f"地址: {customer_address}\n"
             f"電話: {customer_phone}"
         )
+
+    try:
+        return run_write(write)
     except Exception as e:
-        conn.rollback()
         return f"建立客戶資料時發生錯誤: {str(e)}"
-    finally:
-        conn.close()
 
 
 # ============ Function Call 2: 建立訂單草稿 ============
@@ -68,13 +153,15 @@ def create_order_draft(customer_name: str, items: list[dict]) -> str:
 
         total = 0
         draft_lines = []
+        # 下單流程只接受確定的比對（完全相同、別名、唯一包含、同音），模糊猜測改為建議
+        resolved = _resolve_products(
+            conn, [item["product_name"] for item in items], "product_id, product_name, price, stock, unit",
+            min_score=CONFIDENT_SCORE,
+        )
         for item in items:
-            product = conn.execute(
-                "SELECT product_id, product_name, price, stock, unit FROM product WHERE product_name LIKE ?",
-                (f"%{item['product_name']}%",),
-            ).fetchone()
+            product, match = resolved[item["product_name"]]
             if not product:
-                return f"找不到產品「{item['product_name']}」。請使用 query_products 查看可訂購的產品。"
+                return f"{not_found_message(item['product_name'], match)}請使用 query_products 查看可訂購的產品。"
             if product["stock"] < item["quantity"]:
                 return (
                     f"產品「{product['product_name']}」庫存不足"
@@ -120,13 +207,12 @@ def preview_final_order(
 
         total = 0
         draft_lines = []
+        resolved = _resolve_products(conn, [item["product_name"] for item in items], "product_name, price, stock, unit",
+                                     min_score=CONFIDENT_SCORE)
         for item in items:
-            product = conn.execute(
-                "SELECT product_name, price, stock, unit FROM product WHERE product_name LIKE ?",
-                (f"%{item['product_name']}%",),
-            ).fetchone()
+            product, match = resolved[item["product_name"]]
             if not product:
-                return f"找不到產品「{item['product_name']}」。"
+                return not_found_message(item["product_name"], match)
             if product["stock"] < item["quantity"]:
                 return f"產品「{product['product_name']}」庫存不足（庫存: {product['stock']}，需要: {item['quantity']}）。"
             subtotal = product["price"] * item["quantity"]
@@ -158,8 +244,9 @@ def confirm_order(
 ) -> str:
     """【步驟 3c】客戶已確認最終訂單後，呼叫此工具正式寫入資料庫。必須在 preview_final_order 之後、客戶說「確認」之後才能呼叫。
     items: list of {product_name, quantity}。delivery_method: 專車/郵寄。payment_method: 現金/匯款/貨到付款。"""
-    conn = get_connection()
-    try:
+    names = [item["product_name"] for item in items]
+
+    def write(conn):
         customer = conn.execute(
             "SELECT customer_id FROM customer WHERE customer_name = ?",
             (customer_name,),
@@ -169,13 +256,11 @@ def confirm_order(
 
         total = 0
         validated_items = []
+        resolved = _resolve_products(conn, names, "product_id, product_name, price, stock", matches)
         for item in items:
-            product = conn.execute(
-                "SELECT product_id, product_name, price, stock FROM product WHERE product_name LIKE ?",
-                (f"%{item['product_name']}%",),
-            ).fetchone()
+            product, match = resolved[item["product_name"]]
             if not product:
-                return f"找不到產品「{item['product_name']}」。"
+                return not_found_message(item["product_name"], match)
             if product["stock"] < item["quantity"]:
                 return (
                     f"產品「{product['product_name']}」庫存不足"
@@ -185,7 +270,8 @@ def confirm_order(
             validated_items.append((product, item["quantity"]))
 
         cursor = conn.execute(
-            "INSERT INTO orders (customer_name, delivery_method, payment_method, total_price) VALUES (?, ?, ?, ?)",
+            """INSERT INTO orders (customer_name, delivery_method, payment_method, total_price, created_at)
+               VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)""",
             (customer_name, delivery_method, payment_method, total),
         )
         order_id = cursor.lastrowid
@@ -200,7 +286,6 @@ def confirm_order(
                 (qty, product["product_id"]),
             )
 
-        conn.commit()
         return (
             f"✅ 訂單建立成功！\n"
             f"訂單編號: {order_id}\n"
@@ -209,97 +294,91 @@ def confirm_order(
             f"配送方式: {delivery_method}\n"
             f"收款方式: {payment_method}"
         )
+
+    try:
+        # 名稱比對（可能重建索引）在寫入 transaction 之外完成，不佔住 writer 的鎖
+        matches = _match_products(names, min_score=CONFIDENT_SCORE)
+        return run_write(write)
     except Exception as e:
-        conn.rollback()
         return f"建立訂單時發生錯誤: {str(e)}"
-    finally:
-        conn.close()
 
 
 # ============ 其他功能 ============
 
 @tool
-def query_products(product_name: str = "") -> str:
-    """查詢產品資訊。可以用產品名稱搜尋，或不輸入名稱列出所有產品。
-    Query product information by name, or list all products if no name given."""
+def query_products(product_name: str = "", product_names: list[str] | None = None,
+                   supplier: str = "", page: int = 1) -> str:
+    """查詢產品資訊。可以用產品名稱搜尋，或不輸入名稱分頁列出產品（每頁 50 項，可用 supplier 篩選供應商、page 指定頁數）。
+    同時查詢多個產品時，請用 product_names 列表一次查詢，不要分多次呼叫。
+    Query product information by name (or several names via product_names), or list products
+    page by page (filter by supplier, choose page) if no name given."""
+    names = _collect_names(product_name, product_names)
+    if not names:
+        # 列表由 catalog 依版本快取；分頁避免大型目錄整份塞進 LLM context
+        return get_catalog().render_page_text(page, supplier) or "找不到符合的產品。"
+
     conn = get_connection()
-    if product_name:
-        rows = conn.execute(
-            "SELECT * FROM product WHERE product_name LIKE ?",
-            (f"%{product_name}%",),
-        ).fetchall()
-    else:
-        rows = conn.execute("SELECT * FROM product").fetchall()
+    rows = _fetch_products_like(conn, names)
+    # 名稱打錯或用別名時，改用模糊索引比對
+    missing = [name for name in names if not _rows_for_name(rows, name)]
+    resolved = _resolve_products(conn, missing) if missing else {}
     conn.close()
 
-    if not rows:
-        return "找不到符合的產品。"
-
-    result = []
-    for r in rows:
-        result.append(
-            f"產品ID: {r['product_id']}, 名稱: {r['product_name']}, "
-            f"價格: {r['price']}元/{r['unit']}, 庫存: {r['stock']}{r['unit']}, "
-            f"供應商: {r['supplier']}, 規格: {r['specification']}"
-        )
+    result = [format_product_line(r) for r in rows]
+    for name in missing:
+        row, match = resolved[name]
+        if row is None:
+            result.append(not_found_message(name, match))
+        elif all(r["product_id"] != row["product_id"] for r in rows):
+            rows.append(row)
+            result.append(format_product_line(row))
     return "\n".join(result)
 
 
 @tool
-def check_stock(product_name: str) -> str:
-    """檢查特定產品的庫存狀況，如果低於安全庫存會發出警告。
-    Check stock level for a product and warn if below safety stock."""
+def check_stock(product_name: str = "", product_names: list[str] | None = None) -> str:
+    """檢查產品的庫存狀況，如果低於安全庫存會發出警告。
+    同時查詢多個產品時，請用 product_names 列表一次查詢，不要分多次呼叫。
+    Check stock level for a product (or several via product_names) and warn if below safety stock."""
+    names = _collect_names(product_name, product_names)
+    if not names:
+        return "請提供產品名稱。"
+
     conn = get_connection()
-    row = conn.execute(
-        "SELECT * FROM product WHERE product_name LIKE ?",
-        (f"%{product_name}%",),
-    ).fetchone()
+    resolved = _resolve_products(conn, names)
     conn.close()
 
-    if not row:
-        return f"找不到產品「{product_name}」。"
-
-    status = "正常"
-    if row["stock"] <= row["safety_stock"]:
-        status = "⚠️ 低於安全庫存，需要補貨！"
-
-    return (
-        f"產品: {row['product_name']}\n"
-        f"目前庫存: {row['stock']}{row['unit']}\n"
-        f"安全庫存: {row['safety_stock']}{row['unit']}\n"
-        f"庫存狀態: {status}"
-    )
+    result = []
+    for name in names:
+        row, match = resolved[name]
+        result.append(_format_stock(row) if row else not_found_message(name, match))
+    return "\n\n".join(result)
 
 
 @tool
-def query_orders(customer_name: str = "", order_id: int = 0) -> str:
+def query_orders(customer_name: str = "", order_id: int = 0, include_archived: bool = False) -> str:
     """查詢訂單。可以用客戶名稱或訂單編號查詢。
-    Query orders by customer name or order ID."""
-    conn = get_connection()
+    已送達的舊訂單會被封存，只有 include_archived=True 時才會查詢封存資料。
+    Query orders by customer name or order ID. Archived (old, delivered) orders are only searched with include_archived=True."""
+    conn = get_archive_connection() if include_archived else get_connection()
 
     if order_id:
-        order = conn.execute(
-            "SELECT * FROM orders WHERE order_id = ?", (order_id,)
-        ).fetchone()
-        if not order:
-            conn.close()
-            return f"找不到訂單編號 {order_id}。"
-
-        details = conn.execute(
-            """SELECT d.quantity, d.unit_price, p.product_name, p.unit
-               FROM customer_order_detail d
-               JOIN product p ON d.product_id = p.product_id
-               WHERE d.order_id = ?""",
-            (order_id,),
-        ).fetchall()
+        order, details = _find_order(conn, order_id)
+        archived = False
+        if not order and include_archived:
+            order, details = _find_order(conn, order_id, "archive")
+            archived = order is not None
         conn.close()
+        if not order:
+            hint = "" if include_archived else f"（已送達的舊訂單已封存，請說「查詢封存訂單 {order_id}」）"
+            return f"找不到訂單編號 {order_id}。{hint}"
 
         items_str = "\n".join(
             f"  - {d['product_name']} x {d['quantity']}{d['unit']} (單價: {d['unit_price']}元)"
             for d in details
         )
         return (
-            f"訂單編號: {order['order_id']}\n"
+            f"訂單編號: {order['order_id']}{'（已封存）' if archived else ''}\n"
             f"客戶: {order['customer_name']}\n"
             f"配送方式: {order['delivery_method']}\n"
             f"收款方式: {order['payment_method']}\n"
@@ -308,10 +387,12 @@ def query_orders(customer_name: str = "", order_id: int = 0) -> str:
         )
 
     if customer_name:
-        orders = conn.execute(
-            "SELECT * FROM orders WHERE customer_name LIKE ?",
-            (f"%{customer_name}%",),
-        ).fetchall()
+        sql = "SELECT *, 0 AS archived FROM main.orders WHERE customer_name LIKE ?"
+        params = [f"%{customer_name}%"]
+        if include_archived:
+            sql += " UNION ALL SELECT *, 1 AS archived FROM archive.orders WHERE customer_name LIKE ?"
+            params.append(params[0])
+        orders = conn.execute(sql, params).fetchall()
         conn.close()
 
         if not orders:
@@ -320,7 +401,7 @@ def query_orders(customer_name: str = "", order_id: int = 0) -> str:
         result = []
         for o in orders:
             result.append(
-                f"訂單編號: {o['order_id']}, 總價格: {o['total_price']}元, "
+                f"訂單編號: {o['order_id']}{'（已封存）' if o['archived'] else ''}, 總價格: {o['total_price']}元, "
                 f"配送: {o['delivery_method']}, 收款: {o['payment_method']}"
             )
         return "\n".join(result)
@@ -333,18 +414,12 @@ def query_orders(customer_name: str = "", order_id: int = 0) -> str:
 def record_wastage(product_name: str, loss_quantity: int) -> str:
     """記錄產品損耗。會自動扣除庫存。
     Record product wastage/loss. Stock will be automatically deducted."""
-    conn = get_connection()
-    try:
-        product = conn.execute(
-            "SELECT product_id, product_name, stock FROM product WHERE product_name LIKE ?",
-            (f"%{product_name}%",),
-        ).fetchone()
+    def write(conn):
+        product, match = _resolve_products(conn, [product_name], "product_id, product_name, stock", matches)[product_name]
         if not product:
-            conn.close()
-            return f"找不到產品「{product_name}」。"
+            return not_found_message(product_name, match)
 
         if product["stock"] < loss_quantity:
-            conn.close()
             return (
                 f"損耗數量 ({loss_quantity}) 超過目前庫存 ({product['stock']})，請確認數量。"
             )
@@ -357,7 +432,6 @@ def record_wastage(product_name: str, loss_quantity: int) -> str:
             "UPDATE product SET stock = stock - ? WHERE product_id = ?",
             (loss_quantity, product["product_id"]),
         )
-        conn.commit()
         new_stock = product["stock"] - loss_quantity
         return (
             f"損耗記錄成功！\n"
@@ -365,8 +439,9 @@ def record_wastage(product_name: str, loss_quantity: int) -> str:
             f"損耗數量: {loss_quantity}\n"
             f"剩餘庫存: {new_stock}"
         )
+
+    try:
+        matches = _match_products([product_name], min_score=CONFIDENT_SCORE)
+        return run_write(write)
     except Exception as e:
-        conn.rollback()
         return f"記錄損耗時發生錯誤: {str(e)}"
-    finally:
-        conn.close()
@@ -0,0 +1,219 @@
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+import database
+import db_profile
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# group commit：收集 WRITE_BATCH_WINDOW_MS 內（最多 WRITE_BATCH_MAX 筆）的寫入，合併成一個 transaction
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+# run_write 等待 commit 的上限（秒），逾時會轉成工具的錯誤訊息，不會讓請求永遠卡住
+WRITE_TIMEOUT_S = float(os.getenv("WRITE_TIMEOUT_S", "30"))
+
+WriteFn = Callable[[sqlite3.Connection], Any]
+
+
+class WriteQueue:
+    """Single writer thread that applies write intents in batched transactions.
+
+    Each intent is a function that receives the writer's connection and
+    returns the tool result. Intents in one batch share a transaction;
+    each runs inside its own SAVEPOINT so an exception only rolls back that
+    intent. Futures are resolved after COMMIT, so a returned result means
+    the write is durable. If connecting or a batch fails, that batch's
+    futures get the exception and the next batch reconnects; the thread
+    only exits on close().
+    """
+
+    def __init__(self, db_path: str, window_ms: float = WRITE_BATCH_WINDOW_MS, max_batch: int = WRITE_BATCH_MAX):
+        self.db_path = db_path
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.intents = 0
+        self._last_batch = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: WriteFn) -> Future:
+        future: Future = Future()
+        # 寫入在 writer 執行緒執行，查詢仍計入送出它的請求
+        scope = db_profile.current_scope()
+        if scope is not None:
+            fn = db_profile.bind_scope(fn, scope)
+        self._queue.put((fn, future))
+        return future
+
+    def execute(self, fn: WriteFn, timeout: float | None = None) -> Any:
+        return self.submit(fn).result(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        # 關閉後（或 thread 異常結束時）仍在佇列中的寫入不會再執行
+        self._fail(self._drain(), RuntimeError("db-writer 已關閉"))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = get_connection()
+        # transaction 由 _apply 自行控制
+        conn.isolation_level = None
+        # WAL：讀取不會被寫入鎖住
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _collect(self, first) -> tuple[list, bool]:
+        batch, stop = [first], False
+        # 只有在有其他寫入者時才等待視窗，單一寫入者不必多付延遲
+        busy = self._last_batch > 1 or not self._queue.empty()
+        deadline = time.monotonic() + (self.window if busy else 0)
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self) -> None:
+        conn = None
+        stop = False
+        try:
+            while not stop:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, stop = self._collect(first)
+                self._last_batch = len(batch)
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    if self._apply(conn, batch):
+                        continue
+                except Exception as e:
+                    # 連線失敗（或 _apply 本身出錯）：這批寫入回報錯誤，下一批重新連線
+                    logger.error(f"Writer failed on a batch of {len(batch)}: {e}", exc_info=True)
+                    self._fail(batch, e)
+                if conn is not None:
+                    self._close_quietly(conn)
+                    conn = None
+        finally:
+            # 即使 thread 異常結束也要釋放連線，未提交的 transaction 隨之 rollback，不佔住寫入鎖
+            if conn is not None:
+                self._close_quietly(conn)
+
+    def _drain(self) -> list:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not None:
+                items.append(item)
+
+    @staticmethod
+    def _fail(batch: list, error: Exception) -> None:
+        for _, future in batch:
+            try:
+                future.set_exception(error)
+            except InvalidStateError:
+                pass  # 已完成或已被 run_write 取消
+
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _apply(self, conn: sqlite3.Connection, batch: list) -> bool:
+        """Run one batch; False if it failed and the connection should be replaced."""
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT intent")
+                try:
+                    outcomes.append((future, fn(conn), None))
+                    conn.execute("RELEASE intent")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO intent")
+                    conn.execute("RELEASE intent")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} failed: {e}", exc_info=True)
+            self._fail(batch, e)
+            return False
+
+        self.batches += 1
+        self.intents += len(outcomes)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        return True
+
+
+_lock = threading.Lock()
+_writer: WriteQueue | None = None
+
+
+def get_writer() -> WriteQueue:
+    """Process-wide writer for the current database.DB_PATH."""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.db_path == database.DB_PATH and writer.is_alive():
+        return writer
+    with _lock:
+        if _writer is None or _writer.db_path != database.DB_PATH or not _writer.is_alive():
+            if _writer is not None:
+                if not _writer.is_alive():
+                    logger.error("db-writer thread died, starting a new one")
+                _writer.close()
+            _writer = WriteQueue(database.DB_PATH)
+        return _writer
+
+
+def close_writer() -> None:
+    """Drain and stop the writer thread (called on app shutdown)."""
+    global _writer
+    with _lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def run_write(fn: WriteFn, timeout: float | None = None) -> Any:
+    """Run a write intent on the shared writer and wait for its commit.
+
+    Raises TimeoutError after `timeout` (default WRITE_TIMEOUT_S) seconds.
+    """
+    timeout = WRITE_TIMEOUT_S if timeout is None else timeout
+    future = get_writer().submit(fn)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise TimeoutError(f"資料庫忙碌，寫入等候超過 {timeout:g} 秒，未執行") from None
+        raise TimeoutError(f"資料庫寫入超過 {timeout:g} 秒仍未完成，結果未確認") from None